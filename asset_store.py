@@ -0,0 +1,161 @@
+'''
+    asset_store.py
+
+    - Content-addressed store for downloaded stock media, shared across videos
+    - Objects are keyed by a hash of the source URL plus the rendition (e.g. the target image size)
+    - Per-video files are hardlinks into the store (copies when hardlinks are not possible)
+    - Links are reference counted; the store is capped in size and evicts least recently used unreferenced objects
+'''
+
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class AssetStore:
+    def __init__(self, root="cache/assets", max_bytes=20 * 1024 ** 3):
+        """
+        Parameters:
+        root (str): Directory holding the objects and the index database.
+        max_bytes (int): Size cap of the store; least recently used objects are evicted beyond it.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pending = set()  # Keys added but not linked yet, protected from eviction by other threads
+
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS objects ("
+                "key TEXT PRIMARY KEY, url TEXT, rendition TEXT, size INTEGER, last_access REAL)"
+            )
+            self._db.execute("CREATE TABLE IF NOT EXISTS links (path TEXT PRIMARY KEY, key TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS links_key ON links (key)")
+
+    @staticmethod
+    def make_key(url, rendition):
+        return hashlib.sha256(f"{url}|{rendition}".encode("utf-8")).hexdigest()
+
+    def object_path(self, key):
+        return os.path.join(self.root, "objects", key[:2], key)
+
+    def temp_path(self, name=None):
+        """A scratch path inside the store, on the same filesystem as the objects (random name if none is given)."""
+        return os.path.join(self.root, "tmp", name or uuid.uuid4().hex)
+
+    def lookup(self, url, rendition):
+        """Returns the object path for url/rendition if it is stored, else None."""
+        key = self.make_key(url, rendition)
+        path = self.object_path(key)
+        with self._lock:
+            row = self._db.execute("SELECT key FROM objects WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(path):
+                return None
+            with self._db:
+                self._db.execute("UPDATE objects SET last_access = ? WHERE key = ?", (time.time(), key))
+        return path
+
+    def add(self, url, rendition, src_path):
+        """Moves src_path into the store and returns the object path (the store is trimmed once it is linked)."""
+        key = self.make_key(url, rendition)
+        path = self.object_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+        with self._lock:
+            self._pending.add(key)
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO objects (key, url, rendition, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, url, rendition, os.path.getsize(path), time.time()),
+                )
+        return path
+
+    def link(self, url, rendition, dest):
+        """
+        Places the stored object at dest as a hardlink (or a copy across filesystems) and counts the reference,
+        then evicts beyond max_bytes. Raises FileNotFoundError if the object was evicted since lookup().
+        """
+        key = self.make_key(url, rendition)
+        path = self.object_path(key)
+        if os.path.lexists(dest):
+            os.remove(dest)
+        # Linking and recording the reference under the lock keeps evict() from removing the object in between
+        with self._lock:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Asset store object {path} was evicted")
+            try:
+                os.link(path, dest)
+            except OSError:
+                shutil.copyfile(path, dest)
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO links (path, key) VALUES (?, ?)", (os.path.abspath(dest), key))
+            self._pending.discard(key)
+        self.evict()
+        return dest
+
+    def discard_pending(self, url, rendition):
+        """Makes an added object evictable again when it was not linked (e.g. the link or the caller failed)."""
+        with self._lock:
+            self._pending.discard(self.make_key(url, rendition))
+
+    def release(self, dest):
+        """Drops the reference held by dest (the file itself is left to the caller)."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM links WHERE path = ?", (os.path.abspath(dest),))
+
+    def prune_links(self):
+        """Drops references whose per-video file no longer exists, e.g. after a video directory was deleted."""
+        with self._lock:
+            return self._prune_links()
+
+    def _prune_links(self):
+        paths = [row[0] for row in self._db.execute("SELECT path FROM links")]
+        missing = [(path,) for path in paths if not os.path.exists(path)]
+        with self._db:
+            self._db.executemany("DELETE FROM links WHERE path = ?", missing)
+        return len(missing)
+
+    def refcount(self, url, rendition):
+        key = self.make_key(url, rendition)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM links WHERE key = ?", (key,)).fetchone()[0]
+
+    def evict(self):
+        """
+        Evicts least recently used unreferenced objects until the store fits max_bytes. Objects still linked
+        into a video are kept: removing the shared copy of a hardlinked file would free no space.
+        """
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            # Links of deleted or renamed videos must not keep their objects alive
+            self._prune_links()
+            candidates = self._db.execute(
+                "SELECT o.key, o.size FROM objects o "
+                "WHERE NOT EXISTS (SELECT 1 FROM links l WHERE l.key = o.key) ORDER BY o.last_access"
+            ).fetchall()
+            with self._db:
+                for key, size in candidates:
+                    if total <= self.max_bytes:
+                        break
+                    if key in self._pending:
+                        continue
+                    path = self.object_path(key)
+                    if os.path.exists(path):
+                        os.remove(path)
+                    self._db.execute("DELETE FROM objects WHERE key = ?", (key,))
+                    total -= size
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+            links = self._db.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+        return {"objects": count, "bytes": total, "links": links}
@@ -7,8 +7,6 @@
 '''
 
 from balacoon_tts import TTS
-from huggingface_hub import hf_hub_download, list_repo_files
-import librosa
 import os
 import openai
 import json
@@ -17,6 +15,9 @@ import requests
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+from model_manifest import DEFAULT_MODEL_DIR, DEFAULT_MODEL_NAME, require_model
+from tts_chunks import ThreadLocalModel, split_into_chunks, synthesize_chunks_to_wav
+
 load_dotenv()
 
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -30,6 +31,9 @@ max_stock_image_length = 5  # Maximum display time for stock images in seconds
 max_paragraphs = 3  # Maximum number of paragraphs in the script
 orientation = "landscape"  # Preferred orientation for stock images and videos
 asset_size = "medium"  # Preferred size for stock images and videos
+tts_chunk_chars = 1024  # Longest text passed to Balacoon TTS at once
+tts_chunk_workers = 4  # Sentence chunks synthesized in parallel threads
+tts_sentence_silence = 0.1  # Seconds of silence after each sentence chunk
 
 # Generate random string
 
@@ -162,22 +166,15 @@ def get_tts_audio(video_id):
         bool: True if the TTS audio is successfully generated, otherwise False.
     """
     global max_paragraphs
-    model_repo_dir = "/home/pwalch/projects/Files/YouTubeVideoTool/text2video/tts_models"  # Specify the directory where the model is located
-    model_name_str = "en_us_cmuartic_jets_cpu.addon"  # Specify the appropriate model file
     speaker_str = "rxr"  # Specify the appropriate speaker
     
-    # Here, we are downloading the Balacoon TTS model using Hugging Face Hub
-    # The model is downloaded only if it is not already present in the specified directory.
-    for name in list_repo_files(repo_id="balacoon/tts"):
-        if not os.path.isfile(os.path.join(model_repo_dir, name)):
-            hf_hub_download(
-                repo_id="balacoon/tts",
-                filename=name,
-                local_dir=model_repo_dir,
-            )
-    
-    model_path = os.path.join(model_repo_dir, model_name_str)
-    tts = TTS(model_path)  # Initializing the Balacoon TTS with the specified model
+    # The model is checked against the local manifest without network access (fetch it once with model_manifest.py)
+    model_path = require_model(DEFAULT_MODEL_DIR, DEFAULT_MODEL_NAME)
+    models = ThreadLocalModel(lambda: TTS(model_path))  # Initializing one Balacoon TTS per synthesis thread
+
+    def synthesize(chunk):
+        tts = models.get()
+        return tts.synthesize(chunk, speaker_str), tts.get_sampling_rate()  # Synthesize the audio using Balacoon TTS
     
     # Read script
     with open("videos/" + video_id + "/script.json", "r") as f:
@@ -185,15 +182,13 @@ def get_tts_audio(video_id):
 
     for i in tqdm(range(0, max_paragraphs)):
         text_str = script["p" + str(i)]
-        if len(text_str) > 1024:  # Truncate the text if it is longer than 1024 characters
-            text_str = text_str[:1024]
-        
-        samples = tts.synthesize(text_str, speaker_str)  # Synthesize the audio using Balacoon TTS
+        # Split into sentence chunks within the model's input limit instead of truncating the text
+        chunks = split_into_chunks(text_str, tts_chunk_chars) or [text_str]
         
-        # Assuming `samples` is a numpy array representing the audio waveform
-        # Save it to a .wav file
+        # Synthesize the chunks in parallel and stream them to a .wav file in order
         output_file_path = "videos/" + video_id + "/p" + str(i) + "/audio.wav"
-        librosa.output.write_wav(output_file_path, samples, tts.get_sampling_rate())
+        synthesize_chunks_to_wav(synthesize, chunks, output_file_path,
+                                 silence_seconds=tts_sentence_silence, workers=tts_chunk_workers)
         
     return True
 
@@ -0,0 +1,20 @@
+'''
+    audio_lengths.py
+
+    - Paragraph audio length helpers shared by the Bark (video_creator) and Balacoon (video_creator_balacoon) pipelines
+    - Every audio.wav ends with silence_duration seconds of paragraph-end silence; clip planning uses
+      the speech length without it
+'''
+
+import soundfile as sf
+
+
+def get_tail_silence_frames(rate, silence_duration):
+    """Frames of paragraph-end silence (silence_duration seconds) written at the end of every audio.wav."""
+    return int(silence_duration * rate)
+
+
+def get_speech_length(audio_path, silence_duration):
+    """Length in seconds of a paragraph's audio.wav without its closing silence."""
+    with sf.SoundFile(audio_path) as f:
+        return max(0, f.frames - get_tail_silence_frames(f.samplerate, silence_duration)) / float(f.samplerate)
@@ -0,0 +1,118 @@
+'''
+    bark_batch.py
+
+    - Batched version of Bark's generate_text_semantic for several sentences at once
+    - Sentences are grouped by length so rows of a batch reach end-of-sentence at similar steps
+    - All rows share the same 513-token prompt layout (text, speaker history, infer token), so they
+      step through the GPT in lockstep with one key/value cache and need no extra padding
+'''
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from bark.generation import (
+    OFFLOAD_CPU,
+    SEMANTIC_INFER_TOKEN,
+    SEMANTIC_PAD_TOKEN,
+    SEMANTIC_VOCAB_SIZE,
+    TEXT_ENCODING_OFFSET,
+    TEXT_PAD_TOKEN,
+    _clear_cuda_cache,
+    _inference_mode,
+    _load_history_prompt,
+    _normalize_whitespace,
+    _tokenize,
+    models,
+    models_devices,
+    preload_models,
+)
+
+
+def group_by_length(texts, batch_size):
+    """
+    Splits texts into batches of similar length.
+
+    Returns:
+    list: Lists of indexes into texts.
+    """
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    return [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+
+
+def _encode_prompt(tokenizer, text, semantic_history):
+    encoded_text = np.array(_tokenize(tokenizer, _normalize_whitespace(text))) + TEXT_ENCODING_OFFSET
+    encoded_text = encoded_text[:256]  # Bark lops off text beyond 256 tokens as well
+    encoded_text = np.pad(encoded_text, (0, 256 - len(encoded_text)), constant_values=TEXT_PAD_TOKEN, mode="constant")
+    return np.hstack([encoded_text, semantic_history, np.array([SEMANTIC_INFER_TOKEN])]).astype(np.int64)
+
+
+def generate_text_semantic_batch(texts, history_prompt=None, temp=0.7, min_eos_p=0.2, max_steps=768,
+                                 use_kv_caching=True):
+    """
+    Generates semantic tokens for several texts in one batch, with the same stopping rule as
+    bark.generation.generate_text_semantic (sampled EOS or EOS probability >= min_eos_p).
+
+    Parameters:
+    texts (list): Sentences to synthesize.
+    history_prompt: Speaker preset name, .npz path or loaded prompt dict.
+    temp (float): Sampling temperature.
+    min_eos_p (float): EOS probability at which a row stops.
+    max_steps (int): Maximum number of generated tokens per row.
+    use_kv_caching (bool): Reuse attention keys/values between steps.
+
+    Returns:
+    list: One numpy array of semantic tokens per text, in input order.
+    """
+    if history_prompt is not None:
+        semantic_history = _load_history_prompt(history_prompt)["semantic_prompt"].astype(np.int64)[-256:]
+        semantic_history = np.pad(semantic_history, (0, 256 - len(semantic_history)),
+                                  constant_values=SEMANTIC_PAD_TOKEN, mode="constant")
+    else:
+        semantic_history = np.array([SEMANTIC_PAD_TOKEN] * 256)
+
+    if "text" not in models:
+        preload_models()
+    model = models["text"]["model"]
+    tokenizer = models["text"]["tokenizer"]
+    if OFFLOAD_CPU:
+        model.to(models_devices["text"])
+    device = next(model.parameters()).device
+
+    x = torch.from_numpy(np.stack([_encode_prompt(tokenizer, text, semantic_history) for text in texts]))
+    prompt_length = x.shape[1]
+    lengths = [None] * len(texts)  # Generated tokens per row, set once the row hits EOS
+
+    with _inference_mode():
+        x = x.to(device)
+        kv_cache = None
+        for n in range(max_steps):
+            x_input = x[:, [-1]] if use_kv_caching and kv_cache is not None else x
+            logits, kv_cache = model(x_input, merge_context=True, use_cache=use_kv_caching, past_kv=kv_cache)
+            relevant_logits = torch.cat((logits[:, 0, :SEMANTIC_VOCAB_SIZE], logits[:, 0, [SEMANTIC_PAD_TOKEN]]), dim=1)
+            probs = F.softmax(relevant_logits / temp, dim=-1)
+            item_next = torch.multinomial(probs, num_samples=1)
+
+            eos = (item_next[:, 0] == SEMANTIC_VOCAB_SIZE)
+            if min_eos_p is not None:
+                eos |= probs[:, -1] >= min_eos_p
+            for row in torch.nonzero(eos).flatten().tolist():
+                if lengths[row] is None:
+                    lengths[row] = n
+            if all(length is not None for length in lengths):
+                break
+
+            # Rows that already stopped keep stepping with the batch; their extra tokens are dropped below
+            x = torch.cat((x, item_next.to(x.dtype)), dim=1)
+
+        out = x.detach().cpu().numpy()
+
+    if OFFLOAD_CPU:
+        model.to("cpu")
+    _clear_cuda_cache()
+
+    results = []
+    for row, length in enumerate(lengths):
+        tokens = out[row, prompt_length:prompt_length + (length if length is not None else max_steps)]
+        results.append(tokens[tokens < SEMANTIC_VOCAB_SIZE])
+    return results
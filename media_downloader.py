@@ -0,0 +1,218 @@
+'''
+    media_downloader.py
+
+    - Downloads stock images and videos with a bounded pool of worker threads
+    - Keeps one pooled keep-alive session per host (images.pexels.com, player.vimeo.com, ...)
+    - Per-file deadline and retries; requests are paced by the shared PexelsScheduler when given
+    - Resumable downloads: bodies stream into a .part file that later attempts continue with HTTP Range
+    - Optionally serves files from a shared AssetStore instead of downloading them again
+    - Reports the number of files, bytes and the throughput achieved
+'''
+
+import os
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+
+from pexels_scheduler import parse_retry_after
+
+
+class MediaDownloader:
+    def __init__(self, scheduler=None, max_workers=8, timeout=30, file_timeout=600, retries=3, chunk_size=8 * 1024 * 1024,
+                 store=None, min_chunk_size=64 * 1024, backoff_base=1.0, backoff_max=30.0):
+        """
+        Parameters:
+        scheduler (PexelsScheduler): Optional scheduler pacing the requests.
+        max_workers (int): Number of downloads running at once.
+        timeout (float): Connect/read timeout of a single request in seconds.
+        file_timeout (float): Maximum time for downloading one file, including retries.
+        retries (int): Number of retries per file after the first attempt.
+        chunk_size (int): Largest chunk read at once while streaming to disk.
+        store (AssetStore): Optional content-addressed store shared across videos.
+        min_chunk_size (int): Smallest (and first) chunk read at once; chunks adapt between the two sizes.
+        backoff_base (float): First delay between attempts in seconds, doubled per retry (with jitter).
+        backoff_max (float): Upper bound for a single delay between attempts.
+        """
+        self.scheduler = scheduler
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.file_timeout = file_timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.min_chunk_size = min_chunk_size
+        self.store = store
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _session(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[host] = session
+            return self._sessions[host]
+
+    def _get(self, url, priority, **kwargs):
+        session = self._session(urllib.parse.urlsplit(url).hostname)
+        if self.scheduler is not None:
+            return self.scheduler.get(url, priority=priority, session=session, timeout=self.timeout, **kwargs)
+        return session.get(url, timeout=self.timeout, **kwargs)
+
+    def fetch(self, url, path, priority=0):
+        """
+        Downloads url to path through path + '.part', retrying failed attempts until the per-file deadline.
+        A retry (or a later run) resumes from the bytes already in the .part file with an HTTP Range
+        request; servers that ignore the range restart the file. The .part file is renamed to path
+        only once the download is complete. Attempts are spaced by jittered exponential backoff, or by
+        Retry-After on 429/503 responses.
+
+        Returns:
+        int: Number of bytes downloaded by this call.
+        """
+        part_path = path + ".part"
+        deadline = time.monotonic() + self.file_timeout
+        written = 0
+        last_error = None
+        for attempt in range(self.retries + 1):
+            retry_after = None
+            offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self._get(url, priority, stream=True, headers=headers) as response:
+                    if response.status_code == 416 and offset:
+                        # Nothing left to fetch if the .part file already holds the whole body
+                        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                        if total.isdigit() and int(total) == offset:
+                            os.replace(part_path, path)
+                            return written
+                        os.remove(part_path)
+                        raise IOError("Stale partial download, restarting")
+                    if response.status_code == 206 and response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                        mode = 'ab'
+                    elif response.status_code == 200:
+                        mode, offset = 'wb', 0
+                    else:
+                        if response.status_code in (429, 503):
+                            retry_after = response.headers.get("Retry-After")
+                        raise IOError(f"Status Code {response.status_code}")
+
+                    expected = response.headers.get("Content-Length")
+                    received = 0
+                    with open(part_path, mode) as file:
+                        for chunk in self._iter_adaptive(response, deadline):
+                            file.write(chunk)
+                            received += len(chunk)
+                            written += len(chunk)
+                    if expected is not None and not response.headers.get("Content-Encoding") and received != int(expected):
+                        raise IOError(f"Connection dropped after {offset + received} bytes")
+                os.replace(part_path, path)
+                return written
+            except (IOError, requests.RequestException, Urllib3Error) as e:
+                last_error = e
+                print(f"Download attempt {attempt + 1} failed for {url}: {e}")
+                if time.monotonic() > deadline or attempt == self.retries:
+                    break
+                delay = parse_retry_after(retry_after)
+                if delay is None:
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+                time.sleep(max(0.0, min(delay, deadline - time.monotonic())))
+        raise IOError(f"Giving up on {url} (partial download kept in {part_path}): {last_error}")
+
+    def _iter_adaptive(self, response, deadline):
+        """Reads the body in chunks that grow while reads are fast and shrink when they are slow."""
+        chunk_size = self.min_chunk_size
+        while True:
+            started = time.monotonic()
+            if started > deadline:
+                raise TimeoutError(f"exceeded {self.file_timeout} seconds")
+            chunk = response.raw.read(chunk_size, decode_content=True)
+            if not chunk:
+                return
+            yield chunk
+            elapsed = time.monotonic() - started
+            if elapsed < 0.05:
+                chunk_size = min(chunk_size * 2, self.chunk_size)
+            elif elapsed > 0.5:
+                chunk_size = max(chunk_size // 2, self.min_chunk_size)
+
+    def _run_job(self, job):
+        """Returns the number of bytes downloaded and whether the file came from the asset store."""
+        url, path = job['url'], job['path']
+        if self.store is None:
+            written = self.fetch(url, path, job.get('priority', 0))
+            if job.get('postprocess'):
+                job['postprocess'](path)
+            return written, False
+
+        rendition = job.get('rendition', 'original')
+        if self.store.lookup(url, rendition) is not None:
+            try:
+                self.store.link(url, rendition, path)
+                return 0, True
+            except FileNotFoundError:
+                pass  # Evicted by another download since the lookup; fetch it again
+
+        # Download and post-process inside the store so the stored object is the finished rendition.
+        # The scratch name is derived from the key so an interrupted download resumes on the next run.
+        temp_path = self.store.temp_path(self.store.make_key(url, rendition) + os.path.splitext(path)[1])
+        written = self.fetch(url, temp_path, job.get('priority', 0))
+        if job.get('postprocess'):
+            job['postprocess'](temp_path)
+        try:
+            self.store.add(url, rendition, temp_path)
+            self.store.link(url, rendition, path)
+        finally:
+            self.store.discard_pending(url, rendition)
+        return written, False
+
+    def download_all(self, jobs):
+        """
+        Downloads all jobs concurrently.
+
+        Parameters:
+        jobs (list): Dicts with 'url', 'path' and optionally 'priority', 'postprocess' (called with the path)
+                     and 'rendition' (asset store key, together with the url).
+
+        Returns:
+        dict: Summary with the number of downloaded, reused and failed files, bytes, seconds and bytes per second.
+        """
+        start = time.monotonic()
+        total_bytes = 0
+        reused = 0
+        failed = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._run_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    written, from_store = future.result()
+                    total_bytes += written
+                    reused += from_store
+                    print(f"{'Linked' if from_store else 'Downloaded'} {job['url']} to {job['path']}")
+                except Exception as e:
+                    failed.append(job['url'])
+                    print(f"Exception occurred while downloading {job['url']}: {e}")
+
+        seconds = time.monotonic() - start
+        summary = {
+            "files": len(jobs) - len(failed),
+            "reused": reused,
+            "failed": failed,
+            "bytes": total_bytes,
+            "seconds": seconds,
+            "bytes_per_second": total_bytes / seconds if seconds > 0 else 0.0,
+        }
+        print(f"Downloaded {summary['files']}/{len(jobs)} files ({reused} from the asset store), "
+              f"{total_bytes / 1e6:.1f} MB in {seconds:.1f} s "
+              f"({summary['bytes_per_second'] / 1e6:.2f} MB/s)")
+        return summary
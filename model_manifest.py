@@ -0,0 +1,165 @@
+'''
+    model_manifest.py
+
+    - Local manifest of the Balacoon TTS models (tts_models/manifest.json: file name -> sha256, size)
+    - require_model() is the startup check: a stat of the selected .addon only, no network access,
+      so rendering works on air-gapped machines once the models have been fetched
+    - Fetching is an explicit one-time command that downloads only the requested files and
+      verifies them against the manifest checksums
+    - Verified sizes are kept in a stamp file next to the models (.verified.json), never in the
+      tracked manifest; a model with no known size is checksummed once before it is trusted
+    - The model directory defaults to TTS_MODEL_DIR, else the repo's tts_models directory
+
+    Usage:
+        python model_manifest.py fetch en_us_cmuartic_jets_cpu.addon --dir tts_models
+        python model_manifest.py verify --full
+'''
+
+import argparse
+import hashlib
+import json
+import os
+
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_models", "manifest.json")
+DEFAULT_MODEL_DIR = os.getenv("TTS_MODEL_DIR") or os.path.dirname(MANIFEST_PATH)
+STAMP_NAME = ".verified.json"  # name -> {"sha256", "size"} of model files checksummed in that directory
+DEFAULT_MODEL_NAME = "en_us_cmuartic_jets_cpu.addon"
+
+_verified = {}  # path -> (mtime, size) of files that passed require_model
+
+
+class ModelMissingError(FileNotFoundError):
+    pass
+
+
+def load_manifest(path=MANIFEST_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_stamp(model_dir):
+    path = os.path.join(model_dir, STAMP_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_stamp(model_dir, stamp):
+    path = os.path.join(model_dir, STAMP_NAME)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(json.dumps(stamp, indent=4) + "\n")
+    os.replace(temp_path, path)
+
+
+def record_verified(model_dir, name, sha256, size):
+    """Records in the model directory's stamp file that name was checksummed at this size."""
+    try:
+        stamp = load_stamp(model_dir)
+        stamp[name] = {"sha256": sha256, "size": size}
+        save_stamp(model_dir, stamp)
+    except (OSError, ValueError) as e:
+        print(f"Could not record the verified size of {name} in {model_dir}: {e}")  # Checksummed again next time
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(8 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def require_model(model_dir=DEFAULT_MODEL_DIR, name=DEFAULT_MODEL_NAME, full=False, manifest_path=MANIFEST_PATH):
+    """
+    Checks that one model file is present and matches the manifest, without touching the network.
+
+    Parameters:
+    model_dir (str): Directory holding the .addon files.
+    name (str): Model file name.
+    full (bool): Also compare the sha256 (reads the whole file); otherwise only its size is checked,
+                 against the manifest or the stamp file. Without a known size the sha256 is compared
+                 once and the size is stamped.
+    manifest_path (str): Manifest to check against.
+
+    Returns:
+    str: Path of the model file.
+
+    Raises:
+    ModelMissingError: If the file is missing, unknown to the manifest or does not match it.
+    """
+    path = os.path.join(model_dir, name)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise ModelMissingError(f"TTS model {path} not found, fetch it with: python model_manifest.py fetch {name} --dir {model_dir}")
+    if not full and _verified.get(path) == (stat.st_mtime, stat.st_size):
+        return path
+
+    entry = load_manifest(manifest_path)["files"].get(name)
+    if entry is None:
+        raise ModelMissingError(f"TTS model {name} is not listed in {manifest_path}")
+    size = entry.get("size")
+    if size is None:
+        stamped = load_stamp(model_dir).get(name, {})
+        if stamped.get("sha256") == entry["sha256"]:
+            size = stamped["size"]
+    if size is not None and size != stat.st_size:
+        raise ModelMissingError(f"TTS model {path} has {stat.st_size} bytes, expected {size}; fetch it again")
+    if full or size is None:
+        if file_sha256(path) != entry["sha256"]:
+            raise ModelMissingError(f"TTS model {path} does not match its sha256 checksum; fetch it again")
+        record_verified(model_dir, name, entry["sha256"], stat.st_size)
+
+    _verified[path] = (stat.st_mtime, stat.st_size)
+    return path
+
+
+def fetch_models(model_dir=DEFAULT_MODEL_DIR, names=None, manifest_path=MANIFEST_PATH):
+    """
+    Downloads the given model files (default: every file in the manifest) that are missing or do not
+    match their checksum, and stamps their sizes in model_dir for the fast startup check.
+
+    Returns:
+    list: Paths of the verified model files.
+    """
+    from huggingface_hub import hf_hub_download
+
+    manifest = load_manifest(manifest_path)
+    names = names or sorted(manifest["files"])
+    paths = []
+    for name in names:
+        entry = manifest["files"].get(name)
+        if entry is None:
+            raise ModelMissingError(f"TTS model {name} is not listed in {manifest_path}")
+
+        path = os.path.join(model_dir, name)
+        if not os.path.exists(path) or file_sha256(path) != entry["sha256"]:
+            print(f"Downloading {name} from {manifest['repo_id']}")
+            hf_hub_download(repo_id=manifest["repo_id"], filename=name, local_dir=model_dir)
+            if file_sha256(path) != entry["sha256"]:
+                raise ModelMissingError(f"Downloaded {name} does not match its sha256 checksum")
+
+        record_verified(model_dir, name, entry["sha256"], os.path.getsize(path))
+        paths.append(path)
+        print(f"{name}: ok")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch and verify the local TTS models")
+    parser.add_argument("command", choices=["fetch", "verify"])
+    parser.add_argument("names", nargs="*", help="Model files, default: every file in the manifest")
+    parser.add_argument("--dir", default=DEFAULT_MODEL_DIR, help="Model directory")
+    parser.add_argument("--full", action="store_true", help="verify: compare checksums, not only sizes")
+    args = parser.parse_intermixed_args()
+
+    if args.command == "fetch":
+        fetch_models(args.dir, args.names)
+    else:
+        for name in args.names or sorted(load_manifest()["files"]):
+            try:
+                print(f"{name}: ok ({require_model(args.dir, name, full=args.full)})")
+            except ModelMissingError as e:
+                print(f"{name}: {e}")
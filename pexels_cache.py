@@ -0,0 +1,132 @@
+'''
+    pexels_cache.py
+
+    - Persistent on-disk cache for Pexels search responses (SQLite under a cache dir)
+    - Entries are keyed by endpoint + query parameters and expire after a TTL
+    - Least recently used entries are evicted once the entry or size limit is reached
+    - Hit/miss counters are kept per day so the saved Pexels quota can be reported
+'''
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class PexelsCache:
+    def __init__(self, cache_dir="cache/pexels", ttl=86400, max_entries=5000, max_bytes=200 * 1024 * 1024):
+        """
+        Parameters:
+        cache_dir (str): Directory holding the SQLite database.
+        ttl (int): Seconds a cached response stays valid.
+        max_entries (int): Maximum number of cached responses before LRU eviction.
+        max_bytes (int): Maximum total payload size before LRU eviction.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0  # Counters for this process
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "responses.sqlite3"), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, payload TEXT, size INTEGER, created REAL, last_access REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS stats (day TEXT PRIMARY KEY, hits INTEGER, misses INTEGER)"
+            )
+
+    @staticmethod
+    def make_key(endpoint, params):
+        """Build a stable key from the endpoint path and its (unordered) query parameters."""
+        normalized = {k: str(v).strip().lower() for k, v in params.items()}
+        raw = endpoint + "?" + json.dumps(normalized, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss or an expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT payload, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[1] > self.ttl:
+                with self._db:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+
+            if row is None:
+                self.misses += 1
+                self._count(misses=1)
+                return None
+
+            with self._db:
+                self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            self._count(hits=1)
+        return json.loads(row[0])
+
+    def set(self, key, data):
+        """Store a response and evict least recently used entries if the cache is over its limits."""
+        payload = json.dumps(data)
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, payload, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now),
+                )
+            self._evict()
+
+    def _evict(self):
+        with self._db:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            while True:
+                count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+                if count <= self.max_entries and total <= self.max_bytes:
+                    break
+                self._db.execute(
+                    "DELETE FROM responses WHERE key = (SELECT key FROM responses ORDER BY last_access LIMIT 1)"
+                )
+
+    def _count(self, hits=0, misses=0):
+        day = time.strftime("%Y-%m-%d")
+        with self._db:
+            self._db.execute(
+                "INSERT INTO stats (day, hits, misses) VALUES (?, ?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (day, hits, misses),
+            )
+
+    def stats(self, day=None):
+        """
+        Returns:
+        dict: Hit/miss counters for this process and for the given day (default: today),
+              plus the fraction of search requests that never reached the Pexels API.
+        """
+        day = day or time.strftime("%Y-%m-%d")
+        with self._lock:
+            row = self._db.execute("SELECT hits, misses FROM stats WHERE day = ?", (day,)).fetchone()
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        day_hits, day_misses = row if row else (0, 0)
+        day_total = day_hits + day_misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "day": day,
+            "day_hits": day_hits,
+            "day_misses": day_misses,
+            "day_saved_fraction": day_hits / day_total if day_total else 0.0,
+            "entries": count,
+            "bytes": total,
+        }
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
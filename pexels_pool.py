@@ -0,0 +1,66 @@
+'''
+    pexels_pool.py
+
+    - Candidate pool for one Pexels search (kind + description)
+    - Keeps every usable result of the pages fetched so far instead of only the first match
+    - Fetches the next page lazily, only once all kept candidates have been used or rejected
+'''
+
+
+class CandidatePool:
+    def __init__(self, fetch_page, extract, first_page=None, max_pages=3):
+        """
+        Parameters:
+        fetch_page (callable): Returns the parsed search response for a 1-based page number (None on failure).
+        extract (callable): Turns a search response into a list of candidate dicts ('url', 'description').
+        first_page (dict): Already fetched response for page 1, if any.
+        max_pages (int): Maximum number of pages fetched for this search.
+        """
+        self.fetch_page = fetch_page
+        self.extract = extract
+        self.max_pages = max_pages
+        self.candidates = []
+        self.cursor = 0  # Candidates before the cursor have been handed out or rejected
+        self.pages = 0
+        self.exhausted = False
+        if first_page is not None:
+            self._add_page(first_page)
+
+    def _add_page(self, data):
+        self.pages += 1
+        if data is None:
+            # Treat a failed request as the end of the results rather than retrying it for every slot
+            self.exhausted = True
+            return
+        self.candidates.extend(self.extract(data))
+        if not data.get("next_page"):
+            self.exhausted = True
+
+    def _load_next_page(self):
+        if self.exhausted or self.pages >= self.max_pages:
+            return False
+        self._add_page(self.fetch_page(self.pages + 1))
+        return True
+
+    def take(self, accept):
+        """
+        Returns the next candidate for which accept(candidate) is true, fetching further pages as needed.
+        Rejected candidates are skipped for good, so accept should only reject candidates that stay
+        unusable (e.g. already used URLs or descriptions).
+
+        Returns:
+        dict: The candidate, or None once the search has no more results.
+        """
+        while True:
+            if self.cursor >= len(self.candidates):
+                if not self._load_next_page():
+                    return None
+                continue
+            candidate = self.candidates[self.cursor]
+            self.cursor += 1
+            if accept(candidate):
+                return candidate
+
+    def remaining(self):
+        """Number of kept candidates not handed out or rejected yet."""
+        return len(self.candidates) - self.cursor
@@ -0,0 +1,193 @@
+'''
+    pexels_scheduler.py
+
+    - Shared scheduler for all outgoing Pexels requests (API searches and media downloads)
+    - One token bucket per host; the api.pexels.com bucket follows the X-Ratelimit-* headers
+    - Requests for lower priority values (earlier paragraphs) are served first
+    - HTTP 429 responses back off with jittered exponential delays shared by all callers of that host
+'''
+
+import email.utils
+import itertools
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+
+PEXELS_API_HOST = "api.pexels.com"
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delay in seconds or HTTP date), None if absent or invalid."""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        """
+        Parameters:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens (burst size).
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # monotonic time before which no request may start (quota exhausted or 429)
+        self.remaining = None  # Last X-Ratelimit-Remaining reported by the server
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        if self.remaining is not None:
+            self.tokens = min(self.tokens, self.remaining)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until a token is available, 0 if one can be taken now."""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class PexelsScheduler:
+    def __init__(self, requests_per_hour=200, download_rate=10.0, quota_reserve=0, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, timeout=30, api_host=PEXELS_API_HOST):
+        """
+        Parameters:
+        requests_per_hour (int): Pexels API quota per hour; also the burst size of the API bucket.
+        download_rate (float): Requests per second allowed against media hosts.
+        quota_reserve (int): Number of API requests left unused before pausing until the quota resets.
+        max_retries (int): Retries for 429 responses and request errors (connection errors, timeouts).
+        backoff_base (float): First backoff delay in seconds, doubled per retry.
+        backoff_max (float): Upper bound for a single backoff delay.
+        timeout (float): Default request timeout in seconds.
+        api_host (str): Host whose bucket follows the Pexels API quota.
+        """
+        self.requests_per_hour = requests_per_hour
+        self.download_rate = download_rate
+        self.quota_reserve = quota_reserve
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.api_host = api_host
+
+        self._cond = threading.Condition()
+        self._buckets = {}
+        self._waiting = []  # (priority, sequence, host) of callers waiting for a token
+        self._sequence = itertools.count()
+
+    def _bucket(self, host):
+        if host not in self._buckets:
+            if host == self.api_host:
+                self._buckets[host] = TokenBucket(self.requests_per_hour / 3600.0, self.requests_per_hour)
+            else:
+                self._buckets[host] = TokenBucket(self.download_rate, max(1.0, self.download_rate))
+        return self._buckets[host]
+
+    def acquire(self, host, priority=0):
+        """Block until a request to host may be sent. Lower priority values are served first."""
+        with self._cond:
+            entry = (priority, next(self._sequence), host)
+            self._waiting.append(entry)
+            try:
+                while True:
+                    bucket = self._bucket(host)
+                    bucket.refill()
+                    first = min(e for e in self._waiting if e[2] == host)
+                    wait = bucket.wait_time()
+                    if first == entry and wait == 0:
+                        bucket.tokens -= 1
+                        return
+                    self._cond.wait(timeout=wait if first == entry else None)
+            finally:
+                self._waiting.remove(entry)
+                self._cond.notify_all()
+
+    def update_from_headers(self, host, headers):
+        """Track the quota reported by X-Ratelimit-Remaining / X-Ratelimit-Reset."""
+        remaining = headers.get('X-Ratelimit-Remaining')
+        reset = headers.get('X-Ratelimit-Reset')
+        if remaining is None:
+            return
+        try:
+            remaining = int(remaining)
+            reset = float(reset) if reset is not None else None
+        except ValueError:
+            print(f"Ignoring malformed rate limit headers from {host}: remaining={remaining!r} reset={reset!r}")
+            return  # Keep the current bucket state
+        with self._cond:
+            bucket = self._bucket(host)
+            bucket.remaining = max(0, remaining - self.quota_reserve)
+            if bucket.remaining == 0:
+                if reset is not None:
+                    # Pexels reports a UNIX timestamp; treat small values as seconds from now
+                    delay = max(0.0, reset - time.time() if reset > 1e9 else reset)
+                else:
+                    delay = self.backoff_max
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+                bucket.remaining = None  # The quota is full again once blocked_until has passed
+                print(f"Pexels quota exhausted, pausing {host} for {delay:.0f} seconds")
+            self._cond.notify_all()
+
+    def backoff(self, host, attempt, retry_after=None):
+        """Pause all requests to host after a 429, using Retry-After when given, else jittered exponential delay."""
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = min(self.backoff_max, self.backoff_base * 2 ** attempt) * random.uniform(0.5, 1.5)
+        with self._cond:
+            bucket = self._bucket(host)
+            bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        print(f"Rate limited by {host}, backing off for {delay:.1f} seconds (attempt {attempt + 1})")
+
+    def get(self, url, priority=0, **kwargs):
+        """
+        Sends a GET request through the scheduler.
+
+        Parameters:
+        url (str): Request URL.
+        priority (int): Lower values are sent first, e.g. the index of the paragraph blocking the pipeline.
+        kwargs: Passed on to requests.get (or session.get when a 'session' is given).
+
+        Returns:
+        requests.Response: The last response received.
+        """
+        session = kwargs.pop('session', None) or requests
+        kwargs.setdefault('timeout', self.timeout)
+        host = urllib.parse.urlsplit(url).hostname
+
+        for attempt in range(self.max_retries + 1):
+            self.acquire(host, priority)
+            try:
+                response = session.get(url, **kwargs)
+            except requests.RequestException:
+                if attempt == self.max_retries:
+                    raise
+                self.backoff(host, attempt)
+                continue
+
+            self.update_from_headers(host, response.headers)
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            response.close()  # Release the connection before waiting for the retry
+            self.backoff(host, attempt, response.headers.get('Retry-After'))
+        return response
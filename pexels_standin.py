@@ -0,0 +1,308 @@
+'''
+    pexels_standin.py
+
+    - Local stand-in for the Pexels API, so generate_video_assets can run without PEXELS_API_KEY or internet
+    - Serves /v1/search, /videos/search and media downloads from recorded fixtures
+    - Media is served by a second listener under another host name, so downloads are paced by the
+      scheduler's download bucket and not the API quota, as with the real Pexels CDN hosts
+    - Simulates latency, errors, dropped connections and X-Ratelimit-* headers for reproducible benchmarks
+    - Record mode proxies to the real API once and stores the responses and media as fixtures
+
+    Fixture layout (under --fixtures, default fixtures/pexels):
+        searches/images/<key>.json   recorded /v1/search responses
+        searches/videos/<key>.json   recorded /videos/search responses
+        media/<sha1 of url><ext>     recorded media files
+        media/index.json             sha1 -> original media URL
+
+    Usage:
+        python pexels_standin.py --port 8765 --media-port 8764 --latency 0.2 --error-rate 0.05 --rate-limit 200
+        PEXELS_API_BASE=http://127.0.0.1:8765 streamlit run video_app.py
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEARCH_PATHS = {"/v1/search": "images", "/videos/search": "videos"}
+MEDIA_URL_PATTERN = re.compile(r'https?://(?:images\.pexels\.com|player\.vimeo\.com|videos\.pexels\.com)/[^"\s]+')
+
+
+def search_key(query, page=1):
+    return hashlib.sha1(f"{query.strip().lower()}|{page}".encode("utf-8")).hexdigest()
+
+
+def media_key(url):
+    path = urllib.parse.urlsplit(url).path
+    return hashlib.sha1(url.encode("utf-8")).hexdigest() + os.path.splitext(path)[1].lower()
+
+
+class Fixtures:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        for kind in SEARCH_PATHS.values():
+            os.makedirs(os.path.join(root, "searches", kind), exist_ok=True)
+        os.makedirs(os.path.join(root, "media"), exist_ok=True)
+        self.media_index_path = os.path.join(root, "media", "index.json")
+        self.media_index = {}
+        if os.path.exists(self.media_index_path):
+            with open(self.media_index_path) as f:
+                self.media_index = json.load(f)
+
+    def search_path(self, kind, key):
+        return os.path.join(self.root, "searches", kind, key + ".json")
+
+    def load_search(self, kind, query, page):
+        """Recorded response for the query, or a deterministic pick among the recorded ones of that kind."""
+        path = self.search_path(kind, search_key(query, page))
+        if not os.path.exists(path):
+            directory = os.path.join(self.root, "searches", kind)
+            recorded = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+            if not recorded:
+                return None
+            index = int(search_key(query, page), 16) % len(recorded)
+            path = os.path.join(directory, recorded[index])
+        with open(path) as f:
+            return json.load(f)
+
+    def save_search(self, kind, query, page, data):
+        with open(self.search_path(kind, search_key(query, page)), "w") as f:
+            json.dump(data, f)
+        with self._lock:
+            for url in MEDIA_URL_PATTERN.findall(json.dumps(data)):
+                self.media_index[media_key(url)] = url
+            with open(self.media_index_path, "w") as f:
+                json.dump(self.media_index, f)
+
+    def media_path(self, key):
+        return os.path.join(self.root, "media", os.path.basename(key))
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.options.get("verbose"):
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        options = self.server.options
+        url = urllib.parse.urlsplit(self.path)
+
+        if options.get("latency"):
+            time.sleep(options["latency"] * random.uniform(0.5, 1.5))
+
+        if url.path in SEARCH_PATHS and self.server.role == "api":
+            if not self._take_quota():
+                return self._send_json(429, {"error": "Rate limit exceeded"})
+            if random.random() < options.get("error_rate", 0):
+                return self._send_json(500, {"error": "Simulated server error"})
+            return self._search(SEARCH_PATHS[url.path], urllib.parse.parse_qs(url.query))
+
+        if url.path.startswith("/media/") and self.server.role == "media":
+            if random.random() < options.get("error_rate", 0):
+                return self._send_json(503, {"error": "Simulated server error"})
+            return self._media(url.path[len("/media/"):])
+
+        self._send_json(404, {"error": "Not found"})
+
+    def _take_quota(self):
+        """Updates the simulated hourly quota; False once it is exhausted."""
+        limit = self.server.options.get("rate_limit")
+        if not limit:
+            return True
+        with self.server.lock:
+            now = time.time()
+            if now >= self.server.quota_reset:
+                self.server.quota_reset = now + 3600
+                self.server.quota_remaining = limit
+            if self.server.quota_remaining <= 0:
+                return False
+            self.server.quota_remaining -= 1
+            return True
+
+    def _rate_limit_headers(self):
+        limit = self.server.options.get("rate_limit")
+        if not limit or self.server.role != "api":
+            return {}
+        return {
+            "X-Ratelimit-Limit": str(limit),
+            "X-Ratelimit-Remaining": str(max(0, self.server.quota_remaining)),
+            "X-Ratelimit-Reset": str(int(self.server.quota_reset)),
+        }
+
+    def _search(self, kind, query):
+        fixtures = self.server.fixtures
+        text = query.get("query", [""])[0]
+        page = int(query.get("page", ["1"])[0])
+
+        if self.server.options.get("upstream"):
+            data = self._record_search(kind, text, page)
+        else:
+            data = fixtures.load_search(kind, text, page)
+        if data is None:
+            return self._send_json(404, {"error": f"No {kind} fixtures recorded"})
+
+        # Point media links at the media listener so downloads are served from the fixtures too
+        base = f"{self.server.media_url}/media/"
+        body = MEDIA_URL_PATTERN.sub(lambda m: base + media_key(m.group(0)), json.dumps(data))
+        self._send(200, body.encode("utf-8"), "application/json")
+
+    def _record_search(self, kind, text, page):
+        upstream = self.server.options["upstream"].rstrip("/")
+        path = "/v1/search" if kind == "images" else "/videos/search"
+        request = urllib.request.Request(f"{upstream}{path}?{urllib.parse.urlencode(self._upstream_query())}",
+                                         headers={"Authorization": os.getenv("PEXELS_API_KEY", "")})
+        with urllib.request.urlopen(request, timeout=30) as response:
+            data = json.load(response)
+        self.server.fixtures.save_search(kind, text, page, data)
+        print(f"Recorded {kind} search '{text}' page {page}")
+        return data
+
+    def _upstream_query(self):
+        return urllib.parse.parse_qsl(urllib.parse.urlsplit(self.path).query)
+
+    def _media(self, key):
+        fixtures = self.server.fixtures
+        path = fixtures.media_path(key)
+        if not os.path.exists(path) and self.server.options.get("upstream") and key in fixtures.media_index:
+            with urllib.request.urlopen(fixtures.media_index[key], timeout=60) as response, open(path + ".part", "wb") as f:
+                f.write(response.read())
+            os.replace(path + ".part", path)
+            print(f"Recorded media {fixtures.media_index[key]}")
+        if not os.path.exists(path):
+            return self._send_json(404, {"error": "Media not recorded"})
+
+        size = os.path.getsize(path)
+        start, status, headers = 0, 200, {"Accept-Ranges": "bytes"}
+        match = re.match(r"bytes=(\d+)-$", self.headers.get("Range", ""))
+        if match and self.server.options.get("ranges", True):
+            start = int(match.group(1))
+            if start >= size:
+                return self._send(416, b"", "application/octet-stream", {"Content-Range": f"bytes */{size}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{size - 1}/{size}"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(size - start))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        # Optionally drop the connection part-way through to exercise resumable downloads
+        drop = random.random() < self.server.options.get("drop_rate", 0)
+        cutoff = start + (size - start) // 2 if drop else size
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = cutoff - start
+            while remaining > 0:
+                chunk = f.read(min(64 * 1024, remaining))
+                if not chunk:
+                    break
+                self.wfile.write(chunk)
+                remaining -= len(chunk)
+        if drop:
+            self.close_connection = True
+
+    def _send_json(self, status, data):
+        self._send(status, json.dumps(data).encode("utf-8"), "application/json")
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in {**self._rate_limit_headers(), **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def default_media_host(host):
+    """A host name other than the API's that reaches the same machine, so the two get separate rate buckets."""
+    return "127.0.0.1" if host == "localhost" else "localhost"
+
+
+def start_standin(fixtures_dir="fixtures/pexels", host="127.0.0.1", port=0, media_host=None, media_port=0, **options):
+    """
+    Starts the stand-in in background threads: one listener for the API, one for media downloads.
+
+    Parameters:
+    fixtures_dir (str): Directory with the recorded fixtures.
+    host (str): Interface to bind, and host name of the API.
+    port (int): API port to bind, 0 for any free port.
+    media_host (str): Host name put in media URLs, must differ from host; defaults to localhost (127.0.0.1 if host is localhost).
+    media_port (int): Media port to bind, 0 for any free port.
+    options: latency (s), error_rate (0-1), drop_rate (0-1), rate_limit (requests per hour),
+             ranges (bool, honour Range requests), upstream (API base URL to record from), verbose (bool).
+
+    Returns:
+    ThreadingHTTPServer: The running API server; its base URL is server.url, the media server is
+    server.media_server, stop both with server.shutdown().
+    """
+    media_host = media_host or default_media_host(host)
+    if media_host == host:
+        raise ValueError("media_host must differ from host, or downloads share the API rate bucket")
+    fixtures = Fixtures(fixtures_dir)
+    servers = {}
+    for role, bind_port in (("api", port), ("media", media_port)):
+        server = ThreadingHTTPServer((host, bind_port), StandinHandler)
+        server.daemon_threads = True
+        server.role = role
+        server.fixtures = fixtures
+        server.options = options
+        server.lock = threading.Lock()
+        server.quota_remaining = options.get("rate_limit") or 0
+        server.quota_reset = time.time() + 3600
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers[role] = server
+
+    api, media = servers["api"], servers["media"]
+    api.url = f"http://{host}:{api.server_address[1]}"
+    api.media_url = media.url = f"http://{media_host}:{media.server_address[1]}"
+    api.media_server = media
+    stop_api = api.shutdown
+
+    def shutdown():
+        media.shutdown()
+        stop_api()
+
+    api.shutdown = shutdown
+    return api
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Pexels API")
+    parser.add_argument("--fixtures", default="fixtures/pexels", help="Fixture directory")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--media-host", help="Host name of media URLs, different from --host (default: localhost)")
+    parser.add_argument("--media-port", type=int, default=8764)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of media downloads cut off half-way")
+    parser.add_argument("--rate-limit", type=int, default=0, help="Search requests allowed per hour (0: unlimited)")
+    parser.add_argument("--no-ranges", action="store_true", help="Ignore Range headers on media downloads")
+    parser.add_argument("--record", metavar="UPSTREAM", help="Record fixtures from this API base, e.g. https://api.pexels.com")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = start_standin(
+        args.fixtures, args.host, args.port, args.media_host, args.media_port,
+        latency=args.latency, error_rate=args.error_rate, drop_rate=args.drop_rate,
+        rate_limit=args.rate_limit, ranges=not args.no_ranges, upstream=args.record, verbose=args.verbose,
+    )
+    print(f"Pexels stand-in serving {args.fixtures} at {server.url}, media at {server.media_url} (set PEXELS_API_BASE={server.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,87 @@
+'''
+    render_manifest.py
+
+    - Render manifest for incremental re-renders (videos/{id}/render/manifest.json)
+    - Stores per paragraph a hash of everything its render depends on: audio.wav, every image and
+      video asset, the planned durations and the render settings
+    - A paragraph whose hash and cached render file are unchanged is reused instead of re-encoded
+    - File digests are memoized in the manifest by (size, mtime_ns), so unchanged files are not read again
+'''
+
+import hashlib
+import json
+import os
+
+RENDER_VERSION = 2  # Bump when the paragraph rendering itself changes, to invalidate cached renders
+
+
+def file_digest(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(4 * 1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def paragraph_input_hash(audio_path, asset_paths, part_data, render_settings, digest=file_digest):
+    """
+    Parameters:
+    audio_path (str): The paragraph's narration.
+    asset_paths (list): Image and video files in timeline order (missing files are hashed as missing).
+    part_data (dict): Planned clip counts and durations (see get_part_lengths).
+    render_settings (dict): Settings that change the rendered output (size, fps, crossfade, ...).
+    digest (callable): Returns the hex digest of a file; RenderManifest.file_digest skips unchanged files.
+
+    Returns:
+    str: Hex digest identifying the paragraph render.
+    """
+    inputs = {
+        "version": RENDER_VERSION,
+        "audio": digest(audio_path),
+        "assets": [[os.path.basename(path), digest(path) if os.path.exists(path) else None] for path in asset_paths],
+        "part": part_data,
+        "settings": render_settings,
+    }
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RenderManifest:
+    def __init__(self, render_dir):
+        self.path = os.path.join(render_dir, "manifest.json")
+        self.paragraphs = {}  # paragraph number (str) -> {"hash": ..., "file": ...}
+        self.digests = {}  # file path -> {"size": ..., "mtime_ns": ..., "digest": ...}
+        self._used_digests = set()
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                data = json.load(f)
+            self.paragraphs = data.get("paragraphs", {})
+            self.digests = data.get("digests", {})
+
+    def file_digest(self, path):
+        """file_digest(path), reusing the stored digest while the file's size and mtime are unchanged."""
+        stat = os.stat(path)
+        entry = self.digests.get(path)
+        if not entry or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "digest": file_digest(path)}
+            self.digests[path] = entry
+        self._used_digests.add(path)
+        return entry["digest"]
+
+    def is_current(self, p_num, input_hash):
+        """True if paragraph p_num was rendered from the same inputs and its file is still there."""
+        entry = self.paragraphs.get(str(p_num))
+        return bool(entry) and entry["hash"] == input_hash and os.path.exists(entry["file"])
+
+    def file(self, p_num):
+        return self.paragraphs[str(p_num)]["file"]
+
+    def set(self, p_num, input_hash, file_path):
+        self.paragraphs[str(p_num)] = {"hash": input_hash, "file": file_path}
+
+    def save(self):
+        # Only files hashed for this render are kept, so replaced assets do not pile up in the manifest
+        digests = {path: entry for path, entry in self.digests.items() if path in self._used_digests}
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"paragraphs": self.paragraphs, "digests": digests}, f, indent=4)
+        os.replace(temp_path, self.path)
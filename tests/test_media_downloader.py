@@ -0,0 +1,43 @@
+import os
+
+import pexels_standin
+from media_downloader import MediaDownloader
+
+
+class ScriptedRandom:
+    """Stands in for the stand-in's random module: replays the given random() values, then 0.99."""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+    def random(self):
+        return self.values.pop(0) if self.values else 0.99
+
+    def uniform(self, a, b):
+        return (a + b) / 2
+
+
+def test_dropped_download_resumes_with_range(tmp_path, monkeypatch):
+    url = "https://videos.pexels.com/video-files/1/clip.mp4"
+    body = os.urandom(300 * 1024)
+    fixtures = pexels_standin.Fixtures(str(tmp_path / "fixtures"))
+    with open(fixtures.media_path(pexels_standin.media_key(url)), "wb") as f:
+        f.write(body)
+
+    # First request: no simulated error, connection dropped half-way; later requests complete
+    scripted = ScriptedRandom([0.0, 0.0])
+    monkeypatch.setattr(pexels_standin, "random", scripted)
+    server = pexels_standin.start_standin(str(tmp_path / "fixtures"), drop_rate=0.5)
+    try:
+        path = str(tmp_path / "clip.mp4")
+        downloader = MediaDownloader(retries=3, timeout=5, backoff_base=0.01)
+        written = downloader.fetch(f"{server.media_url}/media/{pexels_standin.media_key(url)}", path)
+    finally:
+        server.shutdown()
+
+    assert not scripted.values  # The first response was cut off
+    with open(path, "rb") as f:
+        assert f.read() == body
+    # Resumed from the dropped offset instead of restarting: every byte was downloaded once
+    assert written == len(body)
+    assert not os.path.exists(path + ".part")
@@ -0,0 +1,73 @@
+import math
+import os
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+av = pytest.importorskip("av")
+pytest.importorskip("moviepy.editor")
+Image = pytest.importorskip("PIL.Image")
+video_gen = pytest.importorskip("video_gen")  # Needs the full video_creator stack
+
+SETTINGS = {"max_paragraphs": 2, "video_width": 320, "video_height": 180, "video_fps": 30, "audio_fps": 44100,
+            "duration_crossfade": 0.5, "render_preset": "ultrafast"}
+RATE = 44100
+
+
+def write_paragraph(p_num, speech_seconds, num_images):
+    paragraph_dir = os.path.join("videos", "v", f"p{p_num}")
+    os.makedirs(os.path.join(paragraph_dir, "img"))
+    os.makedirs(os.path.join(paragraph_dir, "video"))
+    for j in range(num_images):
+        frame = np.full((240, 400, 3), 60 * (j + 1), dtype=np.uint8)  # Not the output size: scaled when decoded
+        Image.fromarray(frame).save(os.path.join(paragraph_dir, "img", f"image{j + 1}.jpg"))
+    t = np.arange(int(speech_seconds * RATE)) / RATE
+    audio_path = os.path.join(paragraph_dir, "video", "audio.wav")
+    sf.write(audio_path, 0.2 * np.sin(2 * np.pi * 440 * t), RATE)
+    part_data = {"num_images": num_images, "num_videos": 0, "img_durations": [0.8] * num_images, "vid_durations": []}
+    return part_data, audio_path
+
+
+def stream_params(path):
+    with av.open(path) as container:
+        video, audio = container.streams.video[0], container.streams.audio[0]
+        return (video.codec_context.name, video.codec_context.width, video.codec_context.height,
+                video.codec_context.pix_fmt, str(video.time_base), audio.codec_context.name, audio.codec_context.sample_rate)
+
+
+def test_paragraphs_join_in_sync(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    video_gen.update_settings(SETTINGS)
+    os.makedirs(os.path.join("videos", "v", "render"))
+
+    # Narration lengths that are not whole frames; the second paragraph's clips outlast its narration
+    speech = [1.37, 0.91]
+    paths = []
+    for i, seconds in enumerate(speech):
+        part_data, audio_path = write_paragraph(i + 1, seconds, 2)
+        output_path = os.path.join("videos", "v", "render", f"p{i + 1}.mkv")
+        paths.append(video_gen.render_paragraph("v", i, part_data, audio_path, output_path, SETTINGS))
+    final_path = video_gen.concat_paragraph_files("v", paths, os.path.join("videos", "v", "final_video.mp4"))
+
+    # Stream copy needs the same codec parameters in every paragraph file
+    assert stream_params(paths[0]) == stream_params(paths[1])
+
+    fps = SETTINGS["video_fps"]
+    frames = [math.ceil(max(seconds, 1.1) * fps - 1e-6) for seconds in speech]  # Each timeline lasts 1.1 s
+    with av.open(final_path) as container:
+        video_pts = [float(frame.pts * frame.time_base) for frame in container.decode(video=0)]
+    with av.open(final_path) as container:
+        samples = np.concatenate([frame.to_ndarray().mean(axis=0) for frame in container.decode(audio=0)])
+    assert len(video_pts) == sum(frames)
+    assert abs(len(samples) / RATE - sum(frames) / fps) < 1024 / RATE  # Within one AAC frame
+
+    def rms(start, end):
+        return float(np.sqrt(np.mean(samples[int(start * RATE):int(end * RATE)] ** 2)))
+
+    # The second paragraph's picture and narration both start on the frame after the first paragraph
+    second_start = frames[0] / fps
+    assert video_pts[frames[0]] == pytest.approx(second_start, abs=1e-3)
+    assert rms(speech[0] + 0.005, second_start - 0.005) < 0.01  # Padding after the first narration
+    assert rms(second_start + 0.01, second_start + 0.05) > 0.05
+    assert rms(second_start + speech[1] + 0.02, second_start + 1.05) < 0.01
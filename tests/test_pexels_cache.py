@@ -0,0 +1,29 @@
+import time
+
+from pexels_cache import PexelsCache
+
+
+def test_hit_miss_and_expiry(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    cache = PexelsCache(str(tmp_path), ttl=60)
+    key = PexelsCache.make_key("/v1/search", {"query": "Cat", "page": 1})
+
+    assert cache.get(key) is None
+    cache.set(key, {"photos": [1, 2]})
+    assert cache.get(PexelsCache.make_key("/v1/search", {"page": 1, "query": " cat "})) == {"photos": [1, 2]}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    now[0] += 61
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_lru_eviction(tmp_path):
+    cache = PexelsCache(str(tmp_path), max_entries=2)
+    for query in ("a", "b", "c"):
+        cache.set(query, {"query": query})
+        time.sleep(0.01)
+    assert cache.get("a") is None
+    assert cache.get("c") == {"query": "c"}
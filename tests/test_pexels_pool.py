@@ -0,0 +1,41 @@
+from pexels_pool import CandidatePool
+
+
+def make_page(page, per_page=2, pages=3):
+    return {
+        "page": page,
+        "items": [{"url": f"u{page}-{i}", "description": f"d{page}-{i}"} for i in range(per_page)],
+        "next_page": f"page={page + 1}" if page < pages else None,
+    }
+
+
+def test_pages_fetched_lazily_and_exhausted():
+    fetched = []
+
+    def fetch_page(page):
+        fetched.append(page)
+        return make_page(page)
+
+    pool = CandidatePool(fetch_page, lambda data: data["items"], first_page=make_page(1), max_pages=5)
+    taken = [pool.take(lambda c: True)["url"] for _ in range(2)]
+    assert taken == ["u1-0", "u1-1"] and fetched == []
+
+    # Rejected candidates are skipped; page 2 is fetched only once page 1 is used up
+    assert pool.take(lambda c: c["url"] != "u2-0")["url"] == "u2-1"
+    assert fetched == [2]
+
+    assert [pool.take(lambda c: True)["url"] for _ in range(2)] == ["u3-0", "u3-1"]
+    assert pool.take(lambda c: True) is None  # Page 3 has no next_page
+    assert fetched == [2, 3] and pool.exhausted and pool.remaining() == 0
+
+
+def test_max_pages_and_failed_page():
+    pool = CandidatePool(lambda page: make_page(page, pages=10), lambda data: data["items"], max_pages=1)
+    assert [pool.take(lambda c: True)["url"] for _ in range(2)] == ["u1-0", "u1-1"]
+    assert pool.take(lambda c: True) is None and pool.pages == 1
+
+    calls = []
+    failing = CandidatePool(lambda page: calls.append(page), lambda data: data["items"], max_pages=3)
+    assert failing.take(lambda c: True) is None
+    assert failing.take(lambda c: True) is None
+    assert calls == [1]  # A failed request ends the search instead of being retried for every slot
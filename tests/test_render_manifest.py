@@ -0,0 +1,43 @@
+import os
+
+import render_manifest
+from render_manifest import RenderManifest, paragraph_input_hash
+
+
+def test_digest_memo_skips_unchanged_files(tmp_path, monkeypatch):
+    audio_path = tmp_path / "audio.wav"
+    audio_path.write_bytes(b"narration")
+    hashed = []
+    real_digest = render_manifest.file_digest
+    monkeypatch.setattr(render_manifest, "file_digest", lambda path: hashed.append(path) or real_digest(path))
+
+    manifest = RenderManifest(str(tmp_path))
+    first = paragraph_input_hash(str(audio_path), [], {}, {}, digest=manifest.file_digest)
+    manifest.save()
+    assert hashed == [str(audio_path)]
+
+    # A new manifest for the same render dir reuses the stored digest
+    manifest = RenderManifest(str(tmp_path))
+    assert paragraph_input_hash(str(audio_path), [], {}, {}, digest=manifest.file_digest) == first
+    assert hashed == [str(audio_path)]
+
+    # A changed mtime or size rehashes the file
+    audio_path.write_bytes(b"new narration")
+    stat = audio_path.stat()
+    os.utime(audio_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert paragraph_input_hash(str(audio_path), [], {}, {}, digest=manifest.file_digest) != first
+    assert len(hashed) == 2
+
+
+def test_save_drops_digests_of_unused_files(tmp_path):
+    for name in ("a.jpg", "b.jpg"):
+        (tmp_path / name).write_bytes(name.encode())
+    manifest = RenderManifest(str(tmp_path))
+    manifest.file_digest(str(tmp_path / "a.jpg"))
+    manifest.file_digest(str(tmp_path / "b.jpg"))
+    manifest.save()
+
+    manifest = RenderManifest(str(tmp_path))
+    manifest.file_digest(str(tmp_path / "a.jpg"))
+    manifest.save()
+    assert list(RenderManifest(str(tmp_path)).digests) == [str(tmp_path / "a.jpg")]
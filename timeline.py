@@ -0,0 +1,87 @@
+'''
+    timeline.py
+
+    - Flat timeline compositor for a sequence of clips with crossfades between neighbours
+    - Replaces nesting one CompositeVideoClip per transition: for every output frame the active
+      clip is found by bisecting the start times, and during a crossfade only the outgoing and the
+      incoming clip are rendered and blended with NumPy
+    - Per-frame cost is independent of the number of clips in the sequence
+    - Still images are fitted to the output once; outside crossfades their frame buffer is handed
+      straight to the encoder without any per-frame work
+'''
+
+from bisect import bisect_right
+
+import numpy as np
+from moviepy.editor import ImageClip, VideoClip
+
+
+class Timeline:
+    def __init__(self, clips, crossfade, size):
+        """
+        Parameters:
+        clips (list): MoviePy clips in playback order; each overlaps the previous one by crossfade seconds.
+        crossfade (float): Crossfade duration in seconds.
+        size (tuple): Output (width, height); frames of another size are placed top-left on black.
+        """
+        self.clips = clips
+        self.crossfade = crossfade
+        self.size = tuple(size)
+        self.starts = []
+        start = 0.0
+        for i, clip in enumerate(clips):
+            if i > 0:
+                # The incoming clip starts crossfade seconds before the previous one ends
+                start = max(self.starts[-1], self.starts[-1] + clips[i - 1].duration - crossfade)
+            self.starts.append(start)
+        self.ends = [start + clip.duration for start, clip in zip(self.starts, clips)]
+        self.duration = max(self.ends) if clips else 0
+
+        # Frames of still images (no mask, no effects), fitted to the output size once
+        self.stills = {i: self._fit(clip.img) for i, clip in enumerate(clips)
+                       if isinstance(clip, ImageClip) and clip.mask is None and clip.img.dtype == np.uint8}
+        self._still_floats = {}  # Float copies of stills, made when they first take part in a crossfade
+
+    def _clip_frame(self, index, t):
+        if index in self.stills:
+            return self.stills[index]
+        clip = self.clips[index]
+        local_t = min(max(t - self.starts[index], 0), max(clip.duration - 1e-3, 0))
+        return self._fit(clip.get_frame(local_t))
+
+    def _float_frame(self, index, t):
+        if index not in self.stills:
+            return self._clip_frame(index, t).astype(np.float32)
+        if index not in self._still_floats:
+            self._still_floats[index] = self.stills[index].astype(np.float32)
+        return self._still_floats[index]
+
+    def _fit(self, frame):
+        if frame.ndim == 2:
+            frame = np.dstack([frame] * 3)
+        if frame.shape[2] != 3:
+            frame = frame[:, :, :3]
+        width, height = self.size
+        if frame.shape[0] != height or frame.shape[1] != width:
+            canvas = np.zeros((height, width, 3), dtype=frame.dtype)
+            h, w = min(height, frame.shape[0]), min(width, frame.shape[1])
+            canvas[:h, :w] = frame[:h, :w]
+            frame = canvas
+        return frame
+
+    def make_frame(self, t):
+        index = max(bisect_right(self.starts, t) - 1, 0)
+        frame = self._clip_frame(index, t)
+        if index == 0 or t >= self.ends[index - 1] or self.crossfade <= 0:
+            return frame
+
+        # Inside a crossfade: blend the outgoing clip into the incoming one
+        alpha = np.float32(min(max((t - self.starts[index]) / self.crossfade, 0.0), 1.0))
+        previous = self._float_frame(index - 1, t)
+        current = self._float_frame(index, t) if index in self.stills else frame.astype(np.float32)
+        blended = previous + (current - previous) * alpha
+        return blended.astype(np.uint8)
+
+    def to_clip(self):
+        """Returns the timeline as a single MoviePy VideoClip."""
+        return VideoClip(self.make_frame, duration=self.duration)
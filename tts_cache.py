@@ -0,0 +1,110 @@
+'''
+    tts_cache.py
+
+    - Persistent cache for synthesized sentences (Bark semantic tokens and waveforms)
+    - Keyed by the normalized sentence, speaker, generation parameters, model variant and seed
+    - Entries are .npz files under a cache dir, indexed in SQLite for size-bounded LRU eviction
+'''
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+
+
+def normalize_sentence(sentence):
+    """Collapses whitespace; case and punctuation are kept since they change the prosody."""
+    return re.sub(r"\s+", " ", sentence).strip()
+
+
+class TTSCache:
+    def __init__(self, cache_dir="cache/tts", max_bytes=2 * 1024 ** 3):
+        """
+        Parameters:
+        cache_dir (str): Directory holding the .npz entries and the index database.
+        max_bytes (int): Size cap; least recently used entries are evicted beyond it.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.join(cache_dir, "entries"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False)
+        with self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, size INTEGER, last_access REAL)"
+            )
+
+    @staticmethod
+    def make_key(sentence, speaker, temp, min_eos_p, model_variant, seed=None):
+        raw = json.dumps([normalize_sentence(sentence), str(speaker), temp, min_eos_p, model_variant, seed])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, "entries", key[:2], key + ".npz")
+
+    def get(self, key):
+        """
+        Returns:
+        dict: {'semantic_tokens': ndarray, 'waveform': ndarray} or None on a miss.
+        """
+        path = self._path(key)
+        with self._lock:
+            row = self._db.execute("SELECT key FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or not os.path.exists(path):
+                self.misses += 1
+                return None
+            with self._db:
+                self._db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        with np.load(path) as data:
+            return {"semantic_tokens": data["semantic_tokens"], "waveform": data["waveform"]}
+
+    def set(self, key, semantic_tokens, waveform):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # TTS worker processes and the TTS server share the cache dir: every writer gets its own temp file
+        temp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp.npz"
+        try:
+            np.savez(temp_path, semantic_tokens=np.asarray(semantic_tokens), waveform=np.asarray(waveform, dtype=np.float32))
+            os.replace(temp_path, path)
+        except OSError as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            if not os.path.exists(path):
+                raise
+            print(f"TTS cache entry {key} was written by another process ({e})")  # That writer indexes it
+            return
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                    (key, os.path.getsize(path), time.time()),
+                )
+            self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with self._db:
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                if os.path.exists(self._path(key)):
+                    os.remove(self._path(key))
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
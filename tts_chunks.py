@@ -0,0 +1,101 @@
+'''
+    tts_chunks.py
+
+    - Chunked synthesis for TTS engines with an input length limit (Balacoon takes at most ~1024 characters)
+    - Splits a paragraph into sentence chunks, synthesizes them in parallel threads and writes the WAV
+      incrementally, in order, as soon as each chunk and all chunks before it are done
+    - Each chunk plus its trailing silence is copied into one preallocated buffer before it is written
+'''
+
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import nltk
+import numpy as np
+import soundfile as sf
+
+
+def split_into_chunks(text, max_chars=1024):
+    """
+    Splits text into sentences, breaking sentences longer than max_chars at the last comma or space
+    before the limit, so no narration is dropped.
+
+    Returns:
+    list: Non-empty text chunks of at most max_chars characters.
+    """
+    chunks = []
+    for sentence in nltk.sent_tokenize(re.sub(r"\s+", " ", text).strip()):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(", ", 0, max_chars + 1)  # The comma stays in this chunk, its space may not fit
+            if cut > 0:
+                cut += 1
+            else:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            chunks.append(sentence)
+    return chunks
+
+
+class ThreadLocalModel:
+    """Gives every thread its own model instance, for engines that are not safe to share between threads."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._local = threading.local()
+
+    def get(self):
+        if not hasattr(self._local, "model"):
+            self._local.model = self.factory()
+        return self._local.model
+
+
+def synthesize_chunks_to_wav(synthesize, chunks, output_path, silence_seconds=0.1, workers=4, tail_seconds=0.0):
+    """
+    Synthesizes chunks in parallel and streams them into a WAV file in order.
+
+    Parameters:
+    synthesize (callable): Returns (samples, sampling_rate) for one chunk; called from worker threads.
+    chunks (list): Text chunks, see split_into_chunks.
+    output_path (str): WAV file to write, opened once the first chunk is done.
+    silence_seconds (float): Silence inserted after every chunk.
+    workers (int): Chunks synthesized at once.
+    tail_seconds (float): Extra silence closing the file (e.g. the pause before the next paragraph).
+
+    Returns:
+    int: Number of samples written.
+    """
+    wav = None
+    buffer = None
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(synthesize, chunk) for chunk in chunks]
+        try:
+            for future in futures:
+                samples, sampling_rate = future.result()
+                samples = np.asarray(samples).reshape(-1)
+                if wav is None:
+                    wav = sf.SoundFile(output_path, "w", samplerate=sampling_rate, channels=1)
+                    silence = int(silence_seconds * sampling_rate)
+
+                # Reuse one buffer for chunk + silence, grown geometrically when a longer chunk arrives
+                length = len(samples) + silence
+                if buffer is None or len(buffer) < length or buffer.dtype != samples.dtype:
+                    buffer = np.zeros(max(length, 2 * len(buffer) if buffer is not None else 0), dtype=samples.dtype)
+                buffer[:len(samples)] = samples
+                buffer[len(samples):length] = 0
+                wav.write(buffer[:length])
+                written += length
+
+            if wav is not None and tail_seconds > 0:
+                tail = np.zeros(int(tail_seconds * wav.samplerate), dtype=buffer.dtype)
+                wav.write(tail)
+                written += len(tail)
+        finally:
+            if wav is not None:
+                wav.close()
+    return written
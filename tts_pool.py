@@ -0,0 +1,84 @@
+'''
+    tts_pool.py
+
+    - Synthesizes the paragraphs of a video in a pool of worker processes
+    - Each worker loads its TTS model once (Bark via video_creator, Balacoon via video_creator_balacoon)
+      and then renders whole paragraphs to videos/{id}/pN/video/audio.wav
+    - The number of workers is bounded by the available RAM
+    - Paragraphs are yielded as soon as their audio file is written, in completion order
+'''
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Rough resident memory of one worker, by engine
+WORKER_MEMORY_GB = {"bark": 6.0, "bark_small": 3.0, "balacoon": 0.5}
+
+_write_paragraph_audio = None  # Set in each worker by _init_worker
+
+
+def available_memory_bytes():
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def bounded_worker_count(requested, worker_memory_gb, paragraphs):
+    """Caps the requested number of workers by the paragraph count and by how many fit in free RAM."""
+    count = max(1, min(requested, paragraphs))
+    available = available_memory_bytes()
+    if available:
+        count = max(1, min(count, int(available // (worker_memory_gb * 1024 ** 3))))
+    return count
+
+
+def _init_worker(engine, settings):
+    global _write_paragraph_audio
+    settings = {**settings, "tts_workers": 1}
+    if engine == "bark":
+        import video_creator
+        video_creator.update_settings(settings)
+        video_creator.preload_tts_models()  # Loaded once, then kept for every paragraph of this worker
+        _write_paragraph_audio = video_creator.write_bark_paragraph_audio
+    else:
+        import video_creator_balacoon
+        video_creator_balacoon.update_settings(settings)
+        if video_creator_balacoon.tts_client is None:
+            video_creator_balacoon.load_tts_model()
+        _write_paragraph_audio = video_creator_balacoon.write_tts_paragraph_audio
+
+
+def _run_paragraph(video_id, p_num):
+    return p_num, _write_paragraph_audio(video_id, p_num)
+
+
+def iter_paragraph_audio(engine, settings, video_id, max_paragraphs, workers, worker_memory_gb=None):
+    """
+    Renders every paragraph's audio in worker processes.
+
+    Parameters:
+    engine (str): 'bark' or 'balacoon'.
+    settings (dict): Settings passed to the engine module's update_settings in each worker.
+    video_id (str): Unique identifier for the video.
+    max_paragraphs (int): Number of paragraphs to render.
+    workers (int): Requested number of worker processes.
+    worker_memory_gb (float): Expected memory per worker; defaults to WORKER_MEMORY_GB for the engine.
+
+    Yields:
+    tuple: (p_num, audio_path) for each paragraph as soon as it is written.
+    """
+    if worker_memory_gb is None:
+        small = all(settings.get(f"bark_{name}_use_small", False) for name in ("text", "coarse", "fine"))
+        worker_memory_gb = WORKER_MEMORY_GB["bark_small" if engine == "bark" and small else engine]
+    workers = bounded_worker_count(workers, worker_memory_gb, max_paragraphs)
+    print(f"Synthesizing {max_paragraphs} paragraphs with {workers} {engine} worker processes")
+
+    # Spawned workers start clean instead of inheriting CUDA or model state from this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(engine, settings)) as executor:
+        futures = [executor.submit(_run_paragraph, video_id, i + 1) for i in range(max_paragraphs)]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,259 @@
+'''
+    tts_server.py
+
+    - Long-lived local TTS server holding the Bark and Balacoon models resident between jobs
+    - Bark models are (re)loaded only when the requested model flags differ from the loaded ones
+    - video_creator / video_creator_balacoon send synthesis requests to it through TTSClient when
+      tts_server_url (or TTS_SERVER_URL) is set; otherwise they synthesize in-process with the same code
+    - Requests are JSON over local HTTP, responses are .npz archives; synthesis is serialized on one lock
+
+    Usage:
+        python tts_server.py --port 8766
+        TTS_SERVER_URL=http://127.0.0.1:8766 streamlit run video_app.py
+'''
+
+import argparse
+import io
+import json
+import random
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import requests
+
+from voice_registry import VoiceRegistry, load_voice_prompt
+
+_model_lock = threading.RLock()
+_loaded_bark_flags = None
+
+
+def bark_model_flags(settings):
+    """Keyword arguments for bark.generation.preload_models taken from the settings."""
+    return {
+        "text_use_gpu": settings.get("bark_text_use_gpu", True),
+        "text_use_small": settings.get("bark_text_use_small", False),
+        "coarse_use_gpu": settings.get("bark_coarse_use_gpu", True),
+        "coarse_use_small": settings.get("bark_coarse_use_small", False),
+        "fine_use_gpu": settings.get("bark_fine_use_gpu", True),
+        "fine_use_small": settings.get("bark_fine_use_small", False),
+        "codec_use_gpu": settings.get("bark_codec_use_gpu", True),
+    }
+
+
+def load_bark_models(flags):
+    """Preloads the Bark models for these flags, unless they are already loaded with the same flags."""
+    global _loaded_bark_flags
+    with _model_lock:
+        if flags == _loaded_bark_flags:
+            return
+        from bark.generation import preload_models
+        print(f"Loading Bark models {flags}")
+        # force_reload makes Bark replace models loaded earlier with other small/GPU flags
+        preload_models(**flags, force_reload=_loaded_bark_flags is not None)
+        _loaded_bark_flags = dict(flags)
+
+
+def seed_bark(seed, seed_text):
+    """Seeds Bark's sampling from seed and seed_text so a render is reproducible (no-op without seed)."""
+    if seed is None:
+        return
+    import torch
+    seed = (seed + zlib.crc32(seed_text.encode("utf-8"))) % 2 ** 32
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def synthesize_bark_texts(texts, speaker, temp, min_eos_p, models, seed=None, batch_size=1):
+    """
+    Synthesizes sentences with Bark, loading the models first if needed.
+
+    Parameters:
+    texts (list): Sentences to synthesize.
+    speaker: Bark history prompt (preset name, .npz path or loaded prompt dict).
+    temp (float): Generation temperature.
+    min_eos_p (float): End-of-sentence probability threshold.
+    models (dict): preload_models flags, see bark_model_flags.
+    seed (int): Base seed, None keeps sampling random.
+    batch_size (int): Sentences per text model batch, 1 generates them one by one.
+
+    Returns:
+    list: (semantic_tokens, waveform) per text, in input order.
+    """
+    from bark.api import semantic_to_waveform
+    from bark.generation import generate_text_semantic
+
+    with _model_lock:
+        load_bark_models(models)
+        if isinstance(speaker, str):
+            speaker = load_voice_prompt(speaker)  # Read from disk once per process, then reused from memory
+        results = [None] * len(texts)
+        if batch_size <= 1:
+            for i, text in enumerate(texts):
+                # Seed per sentence so a sentence renders the same wherever it appears
+                seed_bark(seed, text)
+                semantic_tokens = generate_text_semantic(text, history_prompt=speaker, temp=temp, min_eos_p=min_eos_p)
+                results[i] = (semantic_tokens, semantic_to_waveform(semantic_tokens, history_prompt=speaker))
+            return results
+
+        from bark_batch import generate_text_semantic_batch, group_by_length
+
+        for batch in group_by_length(texts, batch_size):
+            batch_texts = [texts[j] for j in batch]
+            print(f"Generating semantic tokens for a batch of {len(batch_texts)} sentences")
+            seed_bark(seed, "".join(batch_texts))
+            batch_tokens = generate_text_semantic_batch(batch_texts, history_prompt=speaker, temp=temp, min_eos_p=min_eos_p)
+            for j, semantic_tokens in zip(batch, batch_tokens):
+                results[j] = (semantic_tokens, semantic_to_waveform(semantic_tokens, history_prompt=speaker))
+        return results
+
+
+def synthesize_balacoon_text(text, speaker):
+    """
+    Returns:
+    tuple: (samples, sampling_rate) from the process-wide Balacoon model.
+    """
+    import video_creator_balacoon
+    with _model_lock:
+        tts = video_creator_balacoon.load_tts_model()
+        return tts.synthesize(text, speaker), tts.get_sampling_rate()
+
+
+def _to_npz(arrays):
+    buffer = io.BytesIO()
+    np.savez(buffer, **arrays)
+    return buffer.getvalue()
+
+
+def _from_npz(data):
+    with np.load(io.BytesIO(data)) as archive:
+        return {name: archive[name] for name in archive.files}
+
+
+class TTSClient:
+    def __init__(self, url, timeout=600):
+        """
+        Parameters:
+        url (str): Base URL of a running tts_server.
+        timeout (float): Seconds to wait for one synthesis request.
+        """
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _post(self, path, payload):
+        response = requests.post(f"{self.url}{path}", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return _from_npz(response.content)
+
+    def synthesize_bark(self, texts, speaker, temp, min_eos_p, models, seed=None, batch_size=1):
+        """Same as synthesize_bark_texts, run by the server. speaker must be a preset name or an .npz path the server can read."""
+        arrays = self._post("/bark", {
+            "texts": texts, "speaker": speaker, "temp": temp, "min_eos_p": min_eos_p,
+            "models": models, "seed": seed, "batch_size": batch_size,
+        })
+        return [(arrays[f"semantic_{i}"], arrays[f"waveform_{i}"]) for i in range(len(texts))]
+
+    def synthesize_balacoon(self, text, speaker):
+        arrays = self._post("/balacoon", {"text": text, "speaker": speaker})
+        return arrays["samples"], int(arrays["sampling_rate"])
+
+    def health(self):
+        return requests.get(f"{self.url}/health", timeout=5).json()
+
+
+class TTSHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self._send(200, json.dumps({"bark_models": _loaded_bark_flags}).encode("utf-8"), "application/json")
+        self._send(404, b'{"error": "Not found"}', "application/json")
+
+    def do_POST(self):
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            if self.path == "/bark":
+                results = synthesize_bark_texts(
+                    payload["texts"], payload["speaker"], payload["temp"], payload["min_eos_p"],
+                    payload["models"], payload.get("seed"), payload.get("batch_size", 1),
+                )
+                arrays = {}
+                for i, (semantic_tokens, waveform) in enumerate(results):
+                    arrays[f"semantic_{i}"] = semantic_tokens
+                    arrays[f"waveform_{i}"] = waveform
+            elif self.path == "/balacoon":
+                samples, sampling_rate = synthesize_balacoon_text(payload["text"], payload["speaker"])
+                arrays = {"samples": samples, "sampling_rate": np.array(sampling_rate)}
+            else:
+                return self._send(404, b'{"error": "Not found"}', "application/json")
+        except Exception as e:
+            print(f"TTS request {self.path} failed: {e}")
+            return self._send(500, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+        self._send(200, _to_npz(arrays), "application/octet-stream")
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_tts_server(host="127.0.0.1", port=0, preload=None, verbose=False, voices=None):
+    """
+    Starts the TTS server in a background thread.
+
+    Parameters:
+    host (str): Interface to bind.
+    port (int): Port to bind, 0 for any free port.
+    preload (dict): Bark model flags to load right away, None loads them on the first request.
+    verbose (bool): Log every request.
+    voices (list): (VoiceRegistry, voice names) whose prompts are loaded right away, None loads them on first use.
+
+    Returns:
+    ThreadingHTTPServer: The running server; its base URL is server.url, stop it with server.shutdown().
+    """
+    if preload is not None:
+        load_bark_models(preload)
+    if voices is not None:
+        registry, names = voices
+        registry.preload(names)
+    server = ThreadingHTTPServer((host, port), TTSHandler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import time
+
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Long-lived TTS model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--settings", default="settings.yaml", help="Settings file whose Bark model flags and speaker are preloaded")
+    parser.add_argument("--lazy", action="store_true", help="Load the models on the first request instead of at startup")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.settings) as f:
+        settings = yaml.safe_load(f)
+    # Requests name voices the way video_creator resolves them, so they hit the prompts preloaded here
+    registry = VoiceRegistry(settings.get("speakers_csv", "SpeakerSettings.csv"), settings.get("voice_dirs", ["AI_Voice_Lab/Voice_Output"]))
+    voices = None if args.lazy else (registry, [settings.get("bark_speaker", "v2/en_speaker_6")])
+    server = start_tts_server(args.host, args.port, None if args.lazy else bark_model_flags(settings), args.verbose, voices)
+    print(f"TTS server listening at {server.url} (set TTS_SERVER_URL={server.url})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,60 @@
+'''
+    tts_tiers.py
+
+    - Named quality-vs-speed TTS tiers: draft, standard and final
+    - A tier picks the engine (Bark or Balacoon) and, for Bark, small or full models per stage
+    - Without a GPU, standard drops to small Bark models everywhere; draft prefers Balacoon (CPU, near real time)
+    - "custom" keeps the raw bark_*_use_small / bark_*_use_gpu settings
+'''
+
+import importlib.util
+
+TTS_TIERS = {
+    "draft": {"engine": "balacoon", "text": True, "coarse": True, "fine": True},
+    "standard": {"engine": "bark", "text": True, "coarse": True, "fine": False},
+    "final": {"engine": "bark", "text": False, "coarse": False, "fine": False},
+}
+TIER_NAMES = ["draft", "standard", "final", "custom"]
+
+
+def gpu_available():
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def apply_tts_tier(settings, tier=None, has_gpu=None):
+    """
+    Returns a copy of the settings with the engine and Bark model flags of a tier.
+
+    Parameters:
+    settings (dict): Current settings.
+    tier (str): draft, standard, final or custom; defaults to settings['tts_tier'] ('custom' if unset).
+    has_gpu (bool): Overrides GPU detection.
+
+    Returns:
+    dict: Settings with tts_tier, tts_engine, tts_gpu and the bark_*_use_small / bark_*_use_gpu flags set.
+    """
+    tier = tier or settings.get("tts_tier") or "custom"
+    has_gpu = gpu_available() if has_gpu is None else has_gpu
+    settings = {**settings, "tts_tier": tier, "tts_gpu": has_gpu}
+    if tier == "custom":
+        settings.setdefault("tts_engine", "bark")
+        return settings
+    if tier not in TTS_TIERS:
+        raise ValueError(f"Unknown TTS tier {tier!r}, expected one of {TIER_NAMES}")
+
+    profile = TTS_TIERS[tier]
+    engine = profile["engine"]
+    if engine == "balacoon" and importlib.util.find_spec("balacoon_tts") is None:
+        engine = "bark"  # Fall back to small Bark models when Balacoon is not installed
+    settings["tts_engine"] = engine
+
+    for stage in ("text", "coarse", "fine"):
+        # Full Bark models on CPU take minutes per paragraph; only the final tier pays that price
+        settings[f"bark_{stage}_use_small"] = profile[stage] or (not has_gpu and tier != "final")
+        settings[f"bark_{stage}_use_gpu"] = has_gpu
+    settings["bark_codec_use_gpu"] = has_gpu
+    return settings
@@ -4,12 +4,10 @@ import os
 import pandas as pd
 from video_creator import generate_video_assets, update_settings as update_settings_video_creator
 from video_gen import video_gen, update_settings as update_settings_video_gen
+from tts_tiers import TIER_NAMES, apply_tts_tier
 import streamlit as st
 import numpy as np
 import nltk
-from bark.generation import generate_text_semantic, preload_models
-from bark.api import semantic_to_waveform
-from bark import SAMPLE_RATE
 
 # Specify the path to settings.yaml and speakers.yaml
 SETTINGS_FILE_PATH = '/home/pwalch/projects/Files/YouTubeVideoTool/text2video/settings.yaml'
@@ -33,9 +31,6 @@ def load_speakers():
 settings = load_settings()
 speakers = load_speakers()
 
-# Initialize Bark Models
-preload_models()
-
 # Streamlit UI setup
 st.sidebar.title('🛠️ Video Creator Settings')
 
@@ -77,15 +72,26 @@ settings["bark_speaker"] = selected_speaker['Prompt Name']
 settings["bark_gen_temp"] = st.sidebar.slider('GEN_TEMP', 0.0, 1.0, value=0.6)
 settings["bark_min_eos_p"] = st.sidebar.slider('MIN_EOS_P', 0.0, 1.0, value=0.05)
 
-# BARK Model Preloading Settings
-st.sidebar.subheader('Model Preloading Settings')
-settings["bark_text_use_gpu"] = st.sidebar.checkbox('Use GPU for Text Model', value=True)
-settings["bark_text_use_small"] = st.sidebar.checkbox('Use Small Text Model', value=False)
-settings["bark_coarse_use_gpu"] = st.sidebar.checkbox('Use GPU for Coarse Model', value=True)
-settings["bark_coarse_use_small"] = st.sidebar.checkbox('Use Small Coarse Model', value=False)
-settings["bark_fine_use_gpu"] = st.sidebar.checkbox('Use GPU for Fine Model', value=True)
-settings["bark_fine_use_small"] = st.sidebar.checkbox('Use Small Fine Model', value=False)
-settings["bark_codec_use_gpu"] = st.sidebar.checkbox('Use GPU for Codec Model', value=True)
+# TTS quality-vs-speed tier: draft (Balacoon or small Bark models), standard, final (full Bark models)
+st.sidebar.subheader('TTS Tier')
+tier_index = TIER_NAMES.index(settings.get("tts_tier") or "custom")
+settings["tts_tier"] = st.sidebar.selectbox('Tier', TIER_NAMES, index=tier_index,
+                                            help='draft for editorial review, final for publishing; custom uses the model settings below')
+
+# BARK Model Preloading Settings (only used by the custom tier)
+if settings["tts_tier"] == "custom":
+    st.sidebar.subheader('Model Preloading Settings')
+    settings["bark_text_use_gpu"] = st.sidebar.checkbox('Use GPU for Text Model', value=True)
+    settings["bark_text_use_small"] = st.sidebar.checkbox('Use Small Text Model', value=False)
+    settings["bark_coarse_use_gpu"] = st.sidebar.checkbox('Use GPU for Coarse Model', value=True)
+    settings["bark_coarse_use_small"] = st.sidebar.checkbox('Use Small Coarse Model', value=False)
+    settings["bark_fine_use_gpu"] = st.sidebar.checkbox('Use GPU for Fine Model', value=True)
+    settings["bark_fine_use_small"] = st.sidebar.checkbox('Use Small Fine Model', value=False)
+    settings["bark_codec_use_gpu"] = st.sidebar.checkbox('Use GPU for Codec Model', value=True)
+tier_settings = apply_tts_tier(settings)
+st.sidebar.caption(f"Engine: {tier_settings['tts_engine']}, GPU: {'yes' if tier_settings['tts_gpu'] else 'no'}")
+# The Bark models are loaded on first synthesis by whichever process synthesizes (this one, a TTS
+# worker or the TTS server), and kept there until the model flags change
 
 # Save Settings Button
 if st.sidebar.button('Save Settings'):
@@ -99,23 +105,43 @@ max_paragraphs = st.slider('Maximum Paragraphs', 2, 10, settings.get("max_paragr
 settings["max_paragraphs"] = max_paragraphs
 
 # Integration with video generation backend (assumed to be implemented)
+# Generating shows a quick low resolution preview first; the full render is a follow-up job
 if st.button('Generate Video'):
-    with st.spinner('🔄 Generating video...'):
+    with st.spinner('🔄 Generating video assets and preview...'):
         # Ensure settings are correctly updated in video_creator script
         update_settings_video_creator(settings)
         # Here you will call your generate_video_assets and video_gen methods
         video_id = generate_video_assets(topic, goal)
+        st.session_state["video_id"] = video_id
+        st.session_state["final_video_path"] = None
         if video_id:
             update_settings_video_gen(settings)
             st.success(f"🎉 Video assets generated successfully for video ID: {video_id}")
-            final_video_path = video_gen(video_id)
-            if final_video_path and os.path.exists(final_video_path):
-                st.success(f"🌟 Video generated successfully. Path: {final_video_path}")
-                st.video(final_video_path)
-            else:
-                st.error("❌ Failed to generate the video.")
+            st.session_state["preview_video_path"] = video_gen(video_id, preview=True)
         else:
+            st.session_state["preview_video_path"] = None
             st.error("❌ Failed to generate video assets.")
         st.json(settings)  # Just to demonstrate what's being passed
 
+if st.session_state.get("video_id"):
+    video_id = st.session_state["video_id"]
+    preview_video_path = st.session_state.get("preview_video_path")
+    if preview_video_path and os.path.exists(preview_video_path):
+        st.subheader('👀 Preview')
+        st.video(preview_video_path)
+    else:
+        st.warning("⚠️ The preview could not be rendered.")
+
+    if st.button('Render Final Video'):
+        with st.spinner('🔄 Rendering final video...'):
+            update_settings_video_gen(settings)
+            st.session_state["final_video_path"] = video_gen(video_id)
+            if not st.session_state["final_video_path"]:
+                st.error("❌ Failed to generate the video.")
+
+    final_video_path = st.session_state.get("final_video_path")
+    if final_video_path and os.path.exists(final_video_path):
+        st.success(f"🌟 Video generated successfully. Path: {final_video_path}")
+        st.video(final_video_path)
+
 # Ensure you have implemented or integrated generate_video_assets and video_gen functions from your backend.
@@ -1,3 +1,5 @@
+import asyncio
+import functools
 import itertools
 import json
 import numpy as np
@@ -7,24 +9,36 @@ import random
 import re
 import requests
 import soundfile as sf
+import subprocess
 import sys
 import nltk
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from huggingface_hub import hf_hub_download, list_repo_files
+from moviepy.config import get_setting
 from moviepy.editor import VideoFileClip
 from nltk import sent_tokenize
 from PIL import Image
 from tqdm import tqdm
 
 # Bark imports
-from bark.api import semantic_to_waveform
-from bark.generation import generate_text_semantic, preload_models
 from bark import SAMPLE_RATE
 
 # Custom imports from your scripts
+from asset_store import AssetStore
+from audio_lengths import get_speech_length, get_tail_silence_frames
+from media_downloader import MediaDownloader
+from pexels_cache import PexelsCache
+from pexels_pool import CandidatePool
+from pexels_scheduler import PexelsScheduler
 from ranking_assistant import RankingAssistant
 from script_creator_no_class import gen_video_script
+from tts_cache import TTSCache
+from tts_pool import iter_paragraph_audio
+from tts_server import TTSClient, bark_model_flags, load_bark_models, synthesize_bark_texts
+from tts_tiers import apply_tts_tier
+from voice_registry import VoiceRegistry
 
 
 
@@ -38,6 +52,11 @@ used_image_urls = set()
 used_video_urls = set()
 unique_descriptions = set()
 used_descriptions = set()
+pexels_cache = None  # Search response cache, created in update_settings
+pexels_scheduler = None  # Rate limit aware scheduler for all Pexels requests, created in update_settings
+asset_store = None  # Content-addressed media store shared across videos, created in update_settings
+candidate_pools = {}  # (kind, model description) -> CandidatePool for the video being generated
+tts_cache = None  # Synthesized sentence cache, created in update_settings
 
 
 def update_settings(settings):
@@ -54,7 +73,20 @@ def update_settings(settings):
     global bark_coarse_use_gpu, bark_coarse_use_small
     global bark_fine_use_gpu, bark_fine_use_small
     global bark_codec_use_gpu
+    global bark_seed, bark_batch_size, tts_cache, bark_models, tts_client, voice_registry
+    global current_settings, tts_workers, tts_worker_memory_gb
+    global pexels_cache, pexels_api_base, pexels_max_concurrency, pexels_scheduler
+    global pexels_max_pages, video_candidates_per_slot
+    global download_workers, download_timeout, download_file_timeout, download_retries, asset_store
+    global trim_downloads
+    global tts_tier, tts_engine, tts_gpu
     
+    # Resolve the TTS tier (draft/standard/final) into the engine and Bark model flags below
+    settings = apply_tts_tier(settings)
+    tts_tier = settings["tts_tier"]
+    tts_engine = settings["tts_engine"]
+    tts_gpu = settings["tts_gpu"]
+    current_settings = settings  # Handed to TTS worker processes
     min_stock_video_length = settings['min_stock_video_length']
     min_stock_image_length = settings['min_stock_image_length']
     max_stock_video_length = settings['max_stock_video_length']
@@ -74,12 +106,72 @@ def update_settings(settings):
     video_height = settings['video_height']
     video_size = (video_width, video_height)
     silence_duration = settings['silence_duration']
+
+    # Pexels API endpoint (PEXELS_API_BASE points it at a local stand-in, see pexels_standin.py)
+    # and number of searches in flight at once
+    pexels_api_base = (os.getenv("PEXELS_API_BASE") or settings.get("pexels_api_base", "https://api.pexels.com")).rstrip("/")
+    pexels_max_concurrency = settings.get("pexels_max_concurrency", 8)
+    pexels_max_pages = settings.get("pexels_max_pages", 3)  # Pages walked per description before giving up
+    video_candidates_per_slot = settings.get("video_candidates_per_slot", 5)  # Videos offered to the ranking per slot
+
+    # Shared scheduler pacing searches and downloads against the Pexels quota, kept across calls
+    # while its settings are unchanged so the learned quota and any backoff survive
+    pexels_scheduler_options = {
+        "requests_per_hour": settings.get("pexels_requests_per_hour", 200),
+        "download_rate": settings.get("pexels_download_rate", 10.0),
+        "quota_reserve": settings.get("pexels_quota_reserve", 0),
+        "max_retries": max_retries,
+        "api_host": urllib.parse.urlsplit(pexels_api_base).hostname,
+    }
+    if pexels_scheduler is None or any(getattr(pexels_scheduler, name) != value for name, value in pexels_scheduler_options.items()):
+        pexels_scheduler = PexelsScheduler(**pexels_scheduler_options)
+
+    # Media download worker pool
+    download_workers = settings.get("download_workers", 8)
+    download_timeout = settings.get("download_timeout", 30)
+    download_file_timeout = settings.get("download_file_timeout", 600)
+    download_retries = settings.get("download_retries", 3)
+    trim_downloads = settings.get("trim_downloads", False)
+
+    # Downloaded media shared across videos (disabled with asset_store_dir: null), reopened only when its settings change
+    asset_store_dir = settings.get("asset_store_dir", "cache/assets")
+    asset_store_max_bytes = settings.get("asset_store_max_gb", 20) * 1024 ** 3
+    if not asset_store_dir:
+        asset_store = None
+    elif asset_store is None or (asset_store.root, asset_store.max_bytes) != (asset_store_dir, asset_store_max_bytes):
+        asset_store = AssetStore(asset_store_dir, max_bytes=asset_store_max_bytes)
+
+    # Pexels search response cache, kept open across calls while its settings are unchanged
+    pexels_cache_options = {
+        "cache_dir": settings.get("pexels_cache_dir", "cache/pexels"),
+        "ttl": settings.get("pexels_cache_ttl", 86400),
+        "max_entries": settings.get("pexels_cache_max_entries", 5000),
+        "max_bytes": settings.get("pexels_cache_max_mb", 200) * 1024 * 1024,
+    }
+    if pexels_cache is None or any(getattr(pexels_cache, name) != value for name, value in pexels_cache_options.items()):
+        pexels_cache = PexelsCache(**pexels_cache_options)
     
     # BARK related settings
     bark_speaker = settings.get("bark_speaker", "v2/en_speaker_6")
     bark_gen_temp = settings.get("bark_gen_temp", 0.6)
     bark_min_eos_p = settings.get("bark_min_eos_p", 0.05)
     bark_model_type = settings.get("bark_model_type", "text")
+    bark_seed = settings.get("bark_seed")  # None keeps Bark's sampling random
+
+    # Voices selectable as bark_speaker: presets from the speakers CSV and custom .npz voices
+    voice_registry = VoiceRegistry(settings.get("speakers_csv", "SpeakerSettings.csv"),
+                                   settings.get("voice_dirs", ["AI_Voice_Lab/Voice_Output"]))
+    bark_batch_size = settings.get("bark_batch_size", 1)  # Sentences per text model batch, 1 disables batching
+    tts_workers = settings.get("tts_workers", 1)  # Paragraphs synthesized in parallel processes, 1 keeps TTS in-process
+    tts_worker_memory_gb = settings.get("tts_worker_memory_gb")  # Memory per worker; None uses the engine default
+
+    # Synthesized sentences reused across videos (disabled with tts_cache_dir: null), reopened only when its settings change
+    tts_cache_dir = settings.get("tts_cache_dir", "cache/tts")
+    tts_cache_max_bytes = settings.get("tts_cache_max_mb", 2048) * 1024 * 1024
+    if not tts_cache_dir:
+        tts_cache = None
+    elif tts_cache is None or (tts_cache.cache_dir, tts_cache.max_bytes) != (tts_cache_dir, tts_cache_max_bytes):
+        tts_cache = TTSCache(tts_cache_dir, max_bytes=tts_cache_max_bytes)
 
     # Initialize or get BARK model preload settings from the settings dictionary
     bark_text_use_gpu = settings.get("bark_text_use_gpu", True)
@@ -90,16 +182,11 @@ def update_settings(settings):
     bark_fine_use_small = settings.get("bark_fine_use_small", False)
     bark_codec_use_gpu = settings.get("bark_codec_use_gpu", True)
 
-    # Ensure BARK models are preloaded with the appropriate settings
-    preload_models(
-        text_use_gpu=bark_text_use_gpu,
-        text_use_small=bark_text_use_small,
-        coarse_use_gpu=bark_coarse_use_gpu,
-        coarse_use_small=bark_coarse_use_small,
-        fine_use_gpu=bark_fine_use_gpu,
-        fine_use_small=bark_fine_use_small,
-        codec_use_gpu=bark_codec_use_gpu,
-    )
+    # Bark models are loaded on first use and only reloaded when these flags change; with a
+    # TTS server (see tts_server.py) they stay resident there instead of in this process
+    bark_models = bark_model_flags(settings)
+    tts_server_url = os.getenv("TTS_SERVER_URL") or settings.get("tts_server_url")
+    tts_client = TTSClient(tts_server_url) if tts_server_url else None
 
 # Helper and core functions
 def get_random_string(length):
@@ -127,6 +214,17 @@ def video_setup(max_paragraphs):
 
     return video_id
 
+def write_video_metadata(video_id, **fields):
+    """Merges fields into videos/{video_id}/metadata.json (TTS tier and engine the video was rendered with)."""
+    metadata_path = f"videos/{video_id}/metadata.json"
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, "r") as f:
+            metadata = json.load(f)
+    metadata.update(fields)
+    with open(metadata_path, "w") as f:
+        json.dump(metadata, f, indent=4)
+
 def create_script_files(video_script_dict, video_id):
     try:
         for paragraph_detail in video_script_dict['script_details']['paragraph_details']:
@@ -159,43 +257,153 @@ def create_script_files(video_script_dict, video_id):
         return False
 
     
+def get_bark_model_variant():
+    """Describes which Bark models (small/full) synthesize the audio, as part of the TTS cache key."""
+    return ",".join(f"{name}:{'small' if use_small else 'full'}" for name, use_small in (
+        ("text", bark_text_use_small), ("coarse", bark_coarse_use_small), ("fine", bark_fine_use_small)))
+
+def get_bark_cache_key(sentence):
+    if not tts_cache:
+        return None
+    return TTSCache.make_key(sentence, bark_speaker, bark_gen_temp, bark_min_eos_p, get_bark_model_variant(), bark_seed)
+
+def preload_tts_models():
+    """Loads the Bark models and the selected voice into this process, unless synthesis goes through a TTS server or Balacoon."""
+    if tts_client is None and tts_engine == "bark":
+        load_bark_models(bark_models)
+        voice_registry.preload([bark_speaker])
+
+def generate_bark_audio(texts):
+    """Synthesizes texts with the global Bark settings, on the TTS server if one is configured."""
+    if tts_client is not None:
+        return tts_client.synthesize_bark(texts, voice_registry.resolve(bark_speaker), bark_gen_temp, bark_min_eos_p,
+                                          bark_models, bark_seed, bark_batch_size)
+    return synthesize_bark_texts(texts, voice_registry.get(bark_speaker), bark_gen_temp, bark_min_eos_p,
+                                 bark_models, bark_seed, bark_batch_size)
+
+def synthesize_bark_sentence(sentence):
+    """
+    Synthesizes one sentence with Bark using the global speaker and generation settings.
+
+    Returns:
+    numpy.ndarray: The waveform at bark.SAMPLE_RATE.
+    """
+    return synthesize_bark_sentences([sentence])[0]
+
+def synthesize_bark_sentences(sentences):
+    """
+    Synthesizes a list of sentences (possibly from several paragraphs) and returns their waveforms in order.
+    Sentences rendered before with the same speaker, parameters, model variant and seed are served
+    from the TTS cache; the others are deduplicated and generated together (in text model batches
+    when bark_batch_size > 1).
+    """
+    waveforms = [None] * len(sentences)
+    missing = {}  # sentence -> positions in sentences
+    for i, sentence in enumerate(sentences):
+        cache_key = get_bark_cache_key(sentence)
+        cached = tts_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            waveforms[i] = cached["waveform"]
+        else:
+            missing.setdefault(sentence, []).append(i)
+
+    texts = list(missing)
+    if not texts:
+        return waveforms
+    for text, (semantic_tokens, audio_array) in zip(texts, generate_bark_audio(texts)):
+        cache_key = get_bark_cache_key(text)
+        if cache_key:
+            tts_cache.set(cache_key, semantic_tokens, audio_array)
+        for i in missing[text]:
+            waveforms[i] = audio_array
+    return waveforms
+
+def read_paragraph_sentences(video_id, p_num):
+    script_file_path = f"videos/{video_id}/p{p_num}/script/script_{p_num}.json"
+
+    with open(script_file_path, "r") as f:
+        script_data = json.load(f)
+        script = script_data["paragraph"].replace("\n", " ").strip()
+
+    return nltk.sent_tokenize(script)
+
+def write_bark_paragraph_audio(video_id, p_num, waveforms=None):
+    """
+    Writes videos/{video_id}/p{p_num}/video/audio.wav from the paragraph's sentences.
+
+    Parameters:
+    video_id (str): Unique identifier for the video.
+    p_num (int): 1-based paragraph number.
+    waveforms (list): Already synthesized sentence waveforms; synthesized here if None.
+
+    Returns:
+    str: Path of the written audio file.
+    """
+    if waveforms is None:
+        waveforms = synthesize_bark_sentences(read_paragraph_sentences(video_id, p_num))
+    gap = int(0.1 * SAMPLE_RATE)  # tenth of a second of silence after each sentence
+    tail = get_tail_silence_frames(SAMPLE_RATE, silence_duration)
+
+    # Assemble the whole paragraph, including its closing silence, in one preallocated buffer
+    audio_output = np.zeros(sum(len(audio_array) + gap for audio_array in waveforms) + tail, dtype=np.float32)
+    position = 0
+    for audio_array in waveforms:
+        audio_output[position:position + len(audio_array)] = audio_array
+        position += len(audio_array) + gap
+
+    output_file_path = f"videos/{video_id}/p{p_num}/video/audio.wav"
+    sf.write(output_file_path, audio_output, SAMPLE_RATE)
+    return output_file_path
+
 # Function to generate TTS audio using BARK
-def get_bark_tts_audio(video_id, max_paragraphs):
-    for i in range(max_paragraphs):
-        p_num = i + 1  # for user-facing file naming (1-based indexing)
-        script_file_path = f"videos/{video_id}/p{p_num}/script/script_{p_num}.json"
-
-        with open(script_file_path, "r") as f:
-            script_data = json.load(f)
-            script = script_data["paragraph"].replace("\n", " ").strip()
-
-        sentences = nltk.sent_tokenize(script)
-        silence = np.zeros(int(0.1 * SAMPLE_RATE))  # quarter second of silence
-
-        pieces = []
-        for sentence in sentences:
-            semantic_tokens = generate_text_semantic(
-                sentence,
-                history_prompt=bark_speaker,  # Use the global variable
-                temp=bark_gen_temp,          # Use the global variable
-                min_eos_p=bark_min_eos_p,    # Use the global variable
-            )
-
-            audio_array = semantic_to_waveform(semantic_tokens, history_prompt=bark_speaker)
-            pieces += [audio_array, silence.copy()]
-
-        audio_output = np.concatenate(pieces)
-        output_file_path = f"videos/{video_id}/p{p_num}/video/audio.wav"
-        sf.write(output_file_path, audio_output, SAMPLE_RATE)
-    
+def get_bark_tts_audio(video_id, max_paragraphs, on_paragraph_done=None):
+    """
+    Synthesizes the audio of every paragraph. With tts_workers > 1 paragraphs are rendered in
+    parallel worker processes; otherwise in this process, with the sentences of all paragraphs
+    batched together when bark_batch_size > 1.
+
+    on_paragraph_done (callable): Called with (p_num, audio_path) as soon as a paragraph's audio is written.
+    """
+    if tts_workers > 1:
+        for p_num, audio_path in iter_paragraph_audio("bark", current_settings, video_id, max_paragraphs,
+                                                      tts_workers, tts_worker_memory_gb):
+            print(f"Paragraph {p_num} audio written to {audio_path}")
+            if on_paragraph_done:
+                on_paragraph_done(p_num, audio_path)
+    elif bark_batch_size > 1:
+        # Collect the sentences of all paragraphs first so they can be batched together
+        paragraph_sentences = [read_paragraph_sentences(video_id, i + 1) for i in range(max_paragraphs)]
+        waveforms = iter(synthesize_bark_sentences([sentence for sentences in paragraph_sentences for sentence in sentences]))
+        for i, sentences in enumerate(paragraph_sentences):
+            audio_path = write_bark_paragraph_audio(video_id, i + 1, [next(waveforms) for _ in sentences])
+            if on_paragraph_done:
+                on_paragraph_done(i + 1, audio_path)
+    else:
+        for i in range(max_paragraphs):
+            audio_path = write_bark_paragraph_audio(video_id, i + 1)
+            if on_paragraph_done:
+                on_paragraph_done(i + 1, audio_path)
+
+    if tts_cache:
+        print(f"TTS cache: {tts_cache.stats()}")
     return True
 
+def get_tts_audio(video_id, max_paragraphs, on_paragraph_done=None):
+    """Synthesizes every paragraph with the engine of the current TTS tier (see tts_tiers.py)."""
+    if tts_engine == "balacoon":
+        import video_creator_balacoon
+        video_creator_balacoon.update_settings(current_settings)
+        return video_creator_balacoon.get_tts_audio(video_id, max_paragraphs, on_paragraph_done)
+    return get_bark_tts_audio(video_id, max_paragraphs, on_paragraph_done)
+
 def clear_video_directory(video_id):
     """Delete the directory associated with the given video_id."""
     video_dir = f"videos/{video_id}"
     if os.path.exists(video_dir):
         import shutil
         shutil.rmtree(video_dir)
+        if asset_store:
+            asset_store.prune_links()
 
 def optimize_clip_distribution(T_a_seconds: float) -> tuple:
     # Retrieve necessary global settings
@@ -240,6 +448,51 @@ def calculate_clip_counts_and_durations(seq_duration, min_duration, max_duration
 
 
 
+def get_part_length(video_id, p_num):
+    """
+    Plans the number of images and videos and their durations for one paragraph from its audio.
+
+    Parameters:
+    video_id (str): Unique identifier for the video.
+    p_num (int): 1-based paragraph number.
+
+    Returns:
+    dict: num_images, num_videos, img_durations and vid_durations, or None if the audio is missing.
+    """
+    global image_per_time, vid_per_time, silence_duration, min_stock_image_length, max_stock_image_length, min_stock_video_length, max_stock_video_length
+
+    audio_path = f"videos/{video_id}/p{p_num}/video/audio.wav"
+    if not os.path.exists(audio_path):
+        print(f"Audio file does not exist for paragraph {p_num}. Skipping.")
+        return None
+
+    # The closing silence is already part of the file, plan with the spoken length as before
+    audio_length = get_speech_length(audio_path, silence_duration)  # Audio length in seconds
+    total_length = audio_length + silence_duration / 1000.0  # Convert ms to s for total length
+
+    # Using the optimize_clip_distribution function
+    N_i, d_i, N_v, d_v = optimize_clip_distribution(total_length)
+
+ 
+    # Prepare durations lists
+    img_durations = [d_i] * int(N_i)
+    vid_durations = [d_v] * int(N_v)
+
+    # Debug print for img_durations and vid_durations
+    print(f"Paragraph {p_num}:")
+    print(f"  Total Lenth:{total_length} seconds")
+    print(f"  Number of Image Clips: {N_i} with Duration: {d_i} seconds each")
+    print(f"  Number of Video Clips: {N_v} with Duration: {d_v} seconds each")
+    print(f"  Image durations: {img_durations}")
+    print(f"  Video durations: {vid_durations}")
+
+    return {
+        "num_images": int(N_i),
+        "num_videos": int(N_v),
+        "img_durations": img_durations,
+        "vid_durations": vid_durations
+    }
+
 def get_part_lengths(video_id, max_paragraphs):
     """
     Calculates the number of images and videos and their respective durations for each paragraph in the video.
@@ -251,46 +504,14 @@ def get_part_lengths(video_id, max_paragraphs):
     Returns:
     dict: Dictionary containing part lengths and associated details.
     """
-    global part_lengths, image_per_time, vid_per_time, silence_duration, min_stock_image_length, max_stock_image_length, min_stock_video_length, max_stock_video_length
+    global part_lengths
 
     part_lengths = {}
 
     for i in range(max_paragraphs):
-        p_num = i + 1
-        audio_path = f"videos/{video_id}/p{p_num}/video/audio.wav"
-        if not os.path.exists(audio_path):
-            print(f"Audio file does not exist for paragraph {p_num}. Skipping.")
-            continue
-
-        with sf.SoundFile(audio_path) as f:
-            frames = f.frames
-            rate = f.samplerate
-            audio_length = frames / float(rate)  # Audio length in seconds
-            total_length = audio_length + silence_duration / 1000.0  # Convert ms to s for total length
-
-        # Using the optimize_clip_distribution function
-        N_i, d_i, N_v, d_v = optimize_clip_distribution(total_length)
-
-     
-        # Prepare durations lists
-        img_durations = [d_i] * int(N_i)
-        vid_durations = [d_v] * int(N_v)
-
-        # Store in part_lengths dictionary
-        part_lengths[i] = {
-            "num_images": int(N_i),
-            "num_videos": int(N_v),
-            "img_durations": img_durations,
-            "vid_durations": vid_durations
-        }
-
-        # Debug print for img_durations and vid_durations
-        print(f"Paragraph {p_num}:")
-        print(f"  Total Lenth:{total_length} seconds")
-        print(f"  Number of Image Clips: {N_i} with Duration: {d_i} seconds each")
-        print(f"  Number of Video Clips: {N_v} with Duration: {d_v} seconds each")
-        print(f"  Image durations: {img_durations}")
-        print(f"  Video durations: {vid_durations}")
+        part_length = get_part_length(video_id, i + 1)
+        if part_length is not None:
+            part_lengths[i] = part_length
 
     return part_lengths
 
@@ -351,62 +572,199 @@ def extract_tags_from_url(url):
 def is_desired_video(file, desired_quality='hd'):
     return file['quality'] == desired_quality
 
-def get_stock_images(video_id, part_number, model_descriptions, media_details, paragraph_key):
-    global part_lengths, used_image_urls, used_descriptions, orientation, asset_size
+def score_video_rendition(video_file, target_size, target_fps):
+    """
+    Scores one entry of a Pexels video's 'video_files'; lower scores are better.
+
+    A rendition that can be scaled down (or is exactly) to fill target_size beats one that needs
+    upscaling; among those, one with at least half of target_fps beats a choppier one, and then the
+    smallest download wins (reported 'size' in bytes, else pixels * fps as a proxy).
+    """
+    width, height = video_file['width'], video_file['height']
+    upscale = max(0.0, max(target_size[0] / width, target_size[1] / height) - 1)
+    fps = video_file.get('fps') or target_fps
+    slow = fps < target_fps / 2
+    cost = video_file.get('size') or width * height * fps
+    return (upscale > 0, upscale, slow, cost)
+
+def select_video_rendition(video_files, target_size, target_fps=30):
+    """
+    Picks the cheapest rendition that fills target_size without upscaling, falling back to the
+    least upscaled one when the video has no large enough file.
+
+    Returns:
+    dict: The selected entry of video_files, or None if none is usable.
+    """
+    candidates = [f for f in video_files
+                  if f.get('width') and f.get('height') and f.get('link')
+                  and f.get('file_type', 'video/mp4') == 'video/mp4']
+    if not candidates:
+        return None
+    return min(candidates, key=lambda f: score_video_rendition(f, target_size, target_fps))
+
+def search_pexels(kind, model_desc, priority=0, page=1):
+    """
+    Searches Pexels photos ('images') or videos ('videos') for a description.
+    Responses are served from the on-disk cache when the same search was made within the TTL,
+    otherwise the request is paced by the shared scheduler; lower priority values
+    (earlier paragraphs) are sent first.
+
+    Returns:
+    dict: Parsed JSON response, or None if the request failed.
+    """
+    global pexels_cache, pexels_api_base, pexels_scheduler, orientation, asset_size
+
+    endpoint = "/v1/search" if kind == "images" else "/videos/search"
+    params = {"query": model_desc, "per_page": 80, "orientation": orientation, "size": asset_size, "page": page}
+    cache_key = PexelsCache.make_key(endpoint, params) if pexels_cache else None
+    if cache_key:
+        data = pexels_cache.get(cache_key)
+        if data is not None:
+            print(f"Cache hit for {kind} search '{model_desc}'")
+            return data
 
     api_key = os.getenv("PEXELS_API_KEY")
+    encoded_desc = urllib.parse.quote(model_desc)
+    api_url = f"{pexels_api_base}{endpoint}?query={encoded_desc}&per_page=80&orientation={orientation}&size={asset_size}&page={page}"
+    print(f"Making API Request to: {api_url}")
+    try:
+        response = pexels_scheduler.get(api_url, priority=priority, headers={"Authorization": api_key})
+    except requests.RequestException as e:
+        print(f"Failed to fetch {kind} for model description '{model_desc}': {e}")
+        return None
+
+    if response.status_code != 200:
+        print(f"Failed to fetch {kind} for model description '{model_desc}', status code: {response.status_code}")
+        return None
+
+    # Extract and print rate limit information
+    rate_limit = response.headers.get('X-Ratelimit-Limit')
+    rate_remaining = response.headers.get('X-Ratelimit-Remaining')
+    rate_reset = response.headers.get('X-Ratelimit-Reset')
+    print(f"------------- RATE LIMIT PEXELS search {kind}:\n")
+    print("Rate Limit Information:")
+    print(f"Rate Limit: {rate_limit}")
+    print(f"Rate Remaining: {rate_remaining}")
+    print(f"Rate Reset: {rate_reset}")
+    print()
+
+    data = response.json()
+    if cache_key:
+        pexels_cache.set(cache_key, data)
+    return data
+
+async def _gather_searches(searches, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(kind, model_desc, priority):
+        async with semaphore:
+            return await asyncio.to_thread(search_pexels, kind, model_desc, priority)
+
+    return await asyncio.gather(*(run(kind, model_desc, priority) for (kind, model_desc), priority in searches.items()))
+
+def prefetch_stock_searches(paragraph_details):
+    """
+    Issues the image and video searches of the given paragraphs concurrently, bounded by pexels_max_concurrency.
+    Only paragraphs already planned in part_lengths are searched. The selection in
+    get_stock_images/get_stock_videos then runs on these results in paragraph order,
+    so the picked media do not depend on which request finished first.
+
+    Parameters:
+    paragraph_details (list): Paragraph details of the video script (all of them, or one as its audio is done).
+
+    Returns:
+    dict: Search responses keyed by (kind, model description).
+    """
+    global part_lengths, pexels_max_concurrency
+
+    searches = {}  # (kind, model description) -> index of the first paragraph that needs it
+    for paragraph_detail in paragraph_details:
+        part_num = int(paragraph_detail['paragraph_number']) - 1
+        if part_num not in part_lengths:
+            continue
+        descriptions = paragraph_detail['image_descriptions']
+        for kind, count_key in (("images", "num_images"), ("videos", "num_videos")):
+            for model_desc in itertools.islice(itertools.cycle(descriptions), part_lengths[part_num][count_key]):
+                searches.setdefault((kind, model_desc), part_num)
+
+    print(f"Prefetching {len(searches)} Pexels searches with up to {pexels_max_concurrency} in flight")
+    results = asyncio.run(_gather_searches(searches, pexels_max_concurrency))
+    return dict(zip(searches, results))
+
+def lookup_search(search_results, kind, model_desc, priority=0):
+    """Returns a prefetched search response, falling back to a live search if it was not prefetched."""
+    if search_results is not None and (kind, model_desc) in search_results:
+        return search_results[(kind, model_desc)]
+    return search_pexels(kind, model_desc, priority)
+
+def get_pexels_cache_stats():
+    """Returns the hit/miss counters of the Pexels search cache (None if no cache is configured)."""
+    return pexels_cache.stats() if pexels_cache else None
+
+def extract_image_candidates(data):
+    """Images of a search response that are at least the target size, as candidate dicts."""
+    target_size = get_target_size(orientation)
+    return [{'url': image["src"]["original"], 'description': image.get('alt', '').strip()}
+            for image in data.get("photos", [])
+            if image['width'] >= target_size[0] and image['height'] >= target_size[1]]
+
+def extract_video_candidates(data):
+    """Videos of a search response with their best rendition, as candidate dicts."""
+    target_size = get_target_size(orientation)
+    candidates = []
+    for video in data.get("videos", []):
+        file = select_video_rendition(video["video_files"], target_size, video_fps)
+        if file is not None:
+            candidates.append({'url': file["link"], 'description': extract_tags_from_url(video['url'])})
+    return candidates
+
+def get_candidate_pool(kind, model_desc, priority=0, search_results=None):
+    """
+    Returns the candidate pool of a search, shared by every slot and paragraph of the current video
+    that uses the same description. Page 1 comes from the prefetched results; further pages are
+    only requested once the pool runs dry.
+    """
+    global candidate_pools, pexels_max_pages
+
+    key = (kind, model_desc)
+    if key not in candidate_pools:
+        candidate_pools[key] = CandidatePool(
+            fetch_page=lambda page: search_pexels(kind, model_desc, priority, page),
+            extract=extract_image_candidates if kind == "images" else extract_video_candidates,
+            first_page=lookup_search(search_results, kind, model_desc, priority),
+            max_pages=pexels_max_pages,
+        )
+    return candidate_pools[key]
+
+def get_stock_images(video_id, part_number, model_descriptions, media_details, paragraph_key, search_results=None):
+    global part_lengths, used_image_urls, used_descriptions
+
     target_image_count = part_lengths[part_number]['num_images']
     print("------------------- get stock images ------------------")
     print(f"{paragraph_key} Target Image Count: {target_image_count}")
-    target_size = get_target_size(orientation)  # Define target size based on orientation
 
-    
+    def is_unique(candidate):
+        return candidate['description'] not in used_descriptions and candidate['url'] not in used_image_urls
+
     model_descriptions_cycle = itertools.cycle(model_descriptions)
     image_index = 1  # Start indexing from 1 for user-facing keys
+    searches_without_match = 0  # Stop once a full cycle of descriptions adds nothing new
 
-    while image_index <= target_image_count:
+    while image_index <= target_image_count and searches_without_match < len(model_descriptions):
         model_desc = next(model_descriptions_cycle)  # Get next description
-        encoded_desc = urllib.parse.quote(model_desc)
-        api_url = f"https://api.pexels.com/v1/search?query={encoded_desc}&per_page=80&orientation={orientation}&size={asset_size}"
-        print(f"Making API Request to: {api_url}")
-        response = requests.get(api_url, headers={"Authorization": api_key})
-
-        if response.status_code == 200:
-            # Extract and print rate limit information
-            rate_limit = response.headers.get('X-Ratelimit-Limit')
-            rate_remaining = response.headers.get('X-Ratelimit-Remaining')
-            rate_reset = response.headers.get('X-Ratelimit-Reset')
-            print(f"------------- RATE LIMIT PEXELS get_stock_images:\n")
-            print("Rate Limit Information:")
-            print(f"Rate Limit: {rate_limit}")
-            print(f"Rate Remaining: {rate_remaining}")
-            print(f"Rate Reset: {rate_reset}")
-            print()
-            data = response.json()
-
-            for image in data.get("photos", []):
-                if image['width'] >= target_size[0] and image['height'] >= target_size[1]:
-                    url = image["src"]["original"]
-                    fetched_description = image.get('alt', '').strip()
-
-                    # Check for uniqueness and add if unique
-                    if fetched_description not in used_descriptions and url not in used_image_urls:
-                        image_list = [{
-                            'url': url,
-                            'description': fetched_description
-                        }]
-                        used_descriptions.add(fetched_description)
-                        used_image_urls.add(url)
-
-                        media_key = f"image{image_index}"
-                        media_details[video_id][paragraph_key][media_key] = image_list
-                        image_index += 1  # Increment for next unique image
-
-                        print(f"Added image {image_index-1}/{target_image_count}, moving to next.")
-                        break  # Break after adding unique image
+        candidate = get_candidate_pool("images", model_desc, part_number, search_results).take(is_unique)
+        searches_without_match += 1
 
-        else:
-            print(f"Failed to fetch images for model description '{model_desc}', status code: {response.status_code}")
+        if candidate is not None:
+            used_descriptions.add(candidate['description'])
+            used_image_urls.add(candidate['url'])
+
+            media_key = f"image{image_index}"
+            media_details[video_id][paragraph_key][media_key] = [candidate]
+            image_index += 1  # Increment for next unique image
+            searches_without_match = 0
+
+            print(f"Added image {image_index-1}/{target_image_count}, moving to next.")
 
         # Exit the loop if all required images have been added
         if image_index > target_image_count:
@@ -415,70 +773,45 @@ def get_stock_images(video_id, part_number, model_descriptions, media_details, p
 
     return media_details  # Return the updated media details with images
 
-def get_stock_videos(video_id, part_number, model_descriptions, media_details, paragraph_key):
-    global part_lengths, used_video_urls, orientation, asset_size, used_descriptions
+def get_stock_videos(video_id, part_number, model_descriptions, media_details, paragraph_key, search_results=None):
+    global part_lengths, used_video_urls, used_descriptions, video_candidates_per_slot
 
-    api_key = os.getenv("PEXELS_API_KEY")
     target_video_count = part_lengths[part_number]['num_videos']
     print("------------------- get stock videos ------------------")
     print(f"{paragraph_key} Target Video Count: {target_video_count}")
-    target_size = get_target_size(orientation)  # Define target size based on orientation
     video_details = {}  # Dictionary to hold lists of urls and descriptive tags per description
 
+    def is_unique(candidate):
+        return candidate['description'] not in used_descriptions and candidate['url'] not in used_video_urls
+
     model_descriptions_cycle = itertools.cycle(model_descriptions)
 
     video_index = 1  # Start indexing from 1 for user-facing keys
+    searches_without_match = 0  # Stop once a full cycle of descriptions adds nothing new
 
-    while video_index <= target_video_count:
+    while video_index <= target_video_count and searches_without_match < len(model_descriptions):
         model_desc = next(model_descriptions_cycle)  # Get next description
-        encoded_desc = urllib.parse.quote(model_desc)
-        api_url = f"https://api.pexels.com/videos/search?query={encoded_desc}&per_page=80&orientation={orientation}&size={asset_size}"
-        print(f"Making API Request to: {api_url}")
-        response = requests.get(api_url, headers={"Authorization": api_key})
-
-        if response.status_code == 200:
-            # Extract and print rate limit information
-            rate_limit = response.headers.get('X-Ratelimit-Limit')
-            rate_remaining = response.headers.get('X-Ratelimit-Remaining')
-            rate_reset = response.headers.get('X-Ratelimit-Reset')
-            print(f"------------- RATE LIMIT PEXELS get_stock_video:\n")
-            print("Rate Limit Information:")
-            print(f"Rate Limit: {rate_limit}")
-            print(f"Rate Remaining: {rate_remaining}")
-            print(f"Rate Reset: {rate_reset}")
-            print()
-            
-            data = response.json()
-            video_list = []  # Initialize an empty list for unique videos in this iteration
-
-            for video in data.get("videos", []):
-                for file in video["video_files"]:
-                    if file['quality'] == 'hd' and file["width"] == target_size[0] and file["height"] == target_size[1]:
-                        url = file["link"]
-                        fetched_description = extract_tags_from_url(video['url'])
-
-                        # Check for uniqueness and add if unique
-                        if fetched_description not in used_descriptions and url not in used_video_urls:
-                            video_list.append({
-                                'url': url,
-                                'description': fetched_description
-                            })
-                            used_descriptions.add(fetched_description)
-                            used_video_urls.add(url)
-
-                            # Break after adding a unique video to the list
-                            break
-
-            # Check if unique video was added and increment video index
-            if video_list:
-                media_key = f"video{video_index}"
-                video_details[media_key] = video_list
-                video_index += 1  # Increment for next unique video
-
-                print(f"Added video {video_index-1}/{target_video_count}. Unique video added.")
-
-        else:
-            print(f"Failed to fetch videos for model description '{model_desc}', status code: {response.status_code}")
+        pool = get_candidate_pool("videos", model_desc, part_number, search_results)
+        searches_without_match += 1
+
+        # Collect up to video_candidates_per_slot unique videos for the ranking to choose from
+        video_list = []
+        while len(video_list) < video_candidates_per_slot:
+            candidate = pool.take(is_unique)
+            if candidate is None:
+                break
+            video_list.append(candidate)
+            used_descriptions.add(candidate['description'])
+            used_video_urls.add(candidate['url'])
+
+        # Check if unique video was added and increment video index
+        if video_list:
+            media_key = f"video{video_index}"
+            video_details[media_key] = video_list
+            video_index += 1  # Increment for next unique video
+            searches_without_match = 0
+
+            print(f"Added video {video_index-1}/{target_video_count}. Unique video added.")
 
         # Exit the loop if all required videos have been added
         if video_index > target_video_count:
@@ -492,7 +825,7 @@ def get_stock_videos(video_id, part_number, model_descriptions, media_details, p
 
 
 
-def get_part_stock_assets(video_id, part_num, descriptions, media_details):
+def get_part_stock_assets(video_id, part_num, descriptions, media_details, search_results=None):
     paragraph_key = f"P{part_num + 1}"  # Assuming part_num is 0-based index
     if paragraph_key not in media_details[video_id]:
         media_details[video_id][paragraph_key] = {}
@@ -504,43 +837,69 @@ def get_part_stock_assets(video_id, part_num, descriptions, media_details):
     video_descriptions = list(itertools.islice(itertools.cycle(descriptions), video_media_count))
 
     # Directly update media_details with the assets
-    get_stock_images(video_id, part_num, image_descriptions, media_details, paragraph_key)
-    get_stock_videos(video_id, part_num, video_descriptions, media_details, paragraph_key)
+    get_stock_images(video_id, part_num, image_descriptions, media_details, paragraph_key, search_results)
+    get_stock_videos(video_id, part_num, video_descriptions, media_details, paragraph_key, search_results)
     
 
+def trim_video_file(file_path, max_length):
+    """
+    Cuts a downloaded clip to its first max_length seconds in place, using ffmpeg stream copy
+    (no re-encode). The clip starts at its first keyframe, so the cut stays keyframe aligned;
+    the stock clip's own audio track is dropped because the narration replaces it.
+    """
+    trimmed_path = f"{os.path.splitext(file_path)[0]}_trimmed.mp4"
+    command = [
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-i", file_path, "-t", f"{max_length:.3f}",
+        "-map", "0:v:0", "-c", "copy", "-an", "-movflags", "+faststart",
+        trimmed_path,
+    ]
+    try:
+        subprocess.run(command, check=True, capture_output=True)
+        original_size = os.path.getsize(file_path)
+        os.replace(trimmed_path, file_path)
+        print(f"Trimmed {file_path} to {max_length:.2f} s ({original_size / 1e6:.1f} MB -> {os.path.getsize(file_path) / 1e6:.1f} MB)")
+    except (OSError, subprocess.CalledProcessError) as e:
+        # Keep the full clip; video_gen only reads the seconds it needs anyway
+        print(f"Exception occurred while trimming {file_path}: {e}")
+        if os.path.exists(trimmed_path):
+            os.remove(trimmed_path)
+
 def trim_and_save_video(url, file_path, max_length, index, target_size):
     """
-    Downloads and saves a video from a given URL without trimming.
-    Saves the resized video as (i)_resized.mp4 to keep the original downloaded video files.
+    Downloads a video from a given URL and trims it to its first max_length seconds.
     """
     try:
-        # Download video
-        video_content = requests.get(url).content
-        original_file_path = file_path  # Save the original file path
-        with open(original_file_path, 'wb') as file:
-            file.write(video_content)
-
-        # Load and resize video
-        #with VideoFileClip(original_file_path) as video:
-        #    resized_video = video.resize(newsize=(1920, 1080))
-        #    # Define the new file path for the resized video
-        #    resized_file_path = f"{os.path.splitext(file_path)[0]}_{index}_resized.mp4"
-        #    resized_video.write_videofile(resized_file_path, codec="libx264", audio_codec="aac")
-        #    print(f"Processed and saved resized video to {resized_file_path}")
+        # Download video (streamed and resumable instead of holding the whole body in memory)
+        MediaDownloader(scheduler=pexels_scheduler).fetch(url, file_path)
+        trim_video_file(file_path, max_length)
     except Exception as e:
         print(f"Error processing video from {url}: {e}")
-        
+
+def get_planned_video_length(part_num, media_key):
+    """
+    Seconds of a downloaded video that the timeline will use: its planned clip duration plus the
+    crossfade margin, or None if the clip is not in the plan.
+    """
+    vid_durations = part_lengths.get(part_num, {}).get('vid_durations', [])
+    video_index = int(media_key[len('video'):]) - 1
+    if 0 <= video_index < len(vid_durations):
+        return vid_durations[video_index] + duration_crossfade
+    return None
+
 def download_stock_media(video_id, media_details):
     # Ensure that video_id exists in media_details
     if video_id not in media_details:
         print(f"Video ID {video_id} not found in media_details")
         return
 
-    target_size = get_target_size(orientation)  # Get the target size based on orientation
-    
+    target_size = get_target_size(orientation)
+    jobs = {}  # media path -> download job; a later item for the same path replaces an earlier one
+
     # Iterate through each paragraph in the media details for the given video_id
     for paragraph_key, paragraph_media in media_details[video_id].items():
         p_num = paragraph_key.lower()  # Convert paragraph_key to lowercase for path construction
+        priority = int(paragraph_key[1:]) - 1  # Earlier paragraphs are needed first
 
         # Iterate through each media type (image or video) in the paragraph
         for media_key, media_list in paragraph_media.items():
@@ -551,33 +910,36 @@ def download_stock_media(video_id, media_details):
 
                 os.makedirs(directory, exist_ok=True)
 
+                if media_type == 'img':
+                    # Resize and crop images to the target size once they land
+                    postprocess = process_image
+                    rendition = f"img-{target_size[0]}x{target_size[1]}"
+                else:
+                    # Optionally keep only the seconds of the clip the timeline will use
+                    max_length = get_planned_video_length(priority, media_key) if trim_downloads else None
+                    postprocess = functools.partial(trim_video_file, max_length=max_length) if max_length else None
+                    rendition = f"video-{max_length:.3f}s" if max_length else "video"
+
                 for index, media_item in enumerate(media_list, start=1):
                     if isinstance(media_item, dict) and 'url' in media_item:
-                        media_url = media_item['url']
-                        filename = f"{media_key}.{extension}"
-                        media_path = os.path.join(directory, filename)
-
-                        # Download and process the media
-                        try:
-                            response = requests.get(media_url, stream=True)
-                            if response.status_code == 200:
-                                with open(media_path, 'wb') as file:
-                                    if media_type == 'img':
-                                        file.write(response.content)
-                                        # Open, Resize, Crop and Save the image
-                                        with Image.open(media_path) as img:
-                                            img = resize_image_aspect_ratio(img, target_size)
-                                            img = crop_center(img, target_size[0], target_size[1])
-                                            img.save(media_path)
-                                    else:  # Assuming media_type is 'video'
-                                        for chunk in response.iter_content(chunk_size=1024):
-                                            if chunk:
-                                                file.write(chunk)
-                                print(f"Downloaded {media_type} to {media_path}")
-                            else:
-                                print(f"Error downloading {media_type} from {media_url}: Status Code {response.status_code}")
-                        except Exception as e:
-                            print(f"Exception occurred while downloading {media_type} from {media_url}: {e}")
+                        media_path = os.path.join(directory, f"{media_key}.{extension}")
+                        jobs[media_path] = {
+                            'url': media_item['url'],
+                            'path': media_path,
+                            'priority': priority,
+                            'postprocess': postprocess,
+                            'rendition': rendition,
+                        }
+
+    downloader = MediaDownloader(
+        scheduler=pexels_scheduler,
+        max_workers=download_workers,
+        timeout=download_timeout,
+        file_timeout=download_file_timeout,
+        retries=download_retries,
+        store=asset_store,
+    )
+    return downloader.download_all(list(jobs.values()))
 
 def process_image(image_path):
     # This function will handle image resizing and cropping
@@ -591,10 +953,13 @@ def process_image(image_path):
         print(f"Exception occurred while processing image {image_path}: {e}")
 
 def generate_video_assets(topic, goal):
-    global part_lengths, orientation, asset_size, max_paragraphs, downloaded_urls, max_retries
+    global part_lengths, orientation, asset_size, max_paragraphs, downloaded_urls, max_retries, candidate_pools
     
     # Set up video directory and return video ID
     video_id = video_setup(max_paragraphs)
+    candidate_pools = {}
+    write_video_metadata(video_id, tts_tier=tts_tier, tts_engine=tts_engine, tts_gpu=tts_gpu,
+                         bark_models=bark_models if tts_engine == "bark" else None, bark_speaker=bark_speaker)
     
     # Initialize sets to keep track of used media URLs and descriptions
     used_image_urls = set()
@@ -615,26 +980,48 @@ def generate_video_assets(topic, goal):
             clear_video_directory(video_id)
             return None
 
-        # Generate Text-To-Speech (TTS) audio for each paragraph
-        if not get_bark_tts_audio(video_id, max_paragraphs):
+        # As soon as a paragraph's audio is written, plan its clips and start its Pexels searches,
+        # so the searches of the first paragraphs overlap with the TTS of the following ones
+        paragraph_details = video_script_dict['script_details']['paragraph_details']
+        details_by_num = {int(detail['paragraph_number']): detail for detail in paragraph_details}
+        part_lengths = {}
+        search_futures = {}
+
+        # One paragraph's searches at a time keeps pexels_max_concurrency a global bound
+        with ThreadPoolExecutor(max_workers=1) as search_executor:
+            def on_paragraph_done(p_num, audio_path):
+                part_length = get_part_length(video_id, p_num)
+                if part_length is None or p_num not in details_by_num:
+                    return
+                part_lengths[p_num - 1] = part_length
+                search_futures[p_num] = search_executor.submit(prefetch_stock_searches, [details_by_num[p_num]])
+
+            # Generate Text-To-Speech (TTS) audio for each paragraph
+            tts_ok = get_tts_audio(video_id, max_paragraphs, on_paragraph_done)
+
+        if not tts_ok:
             clear_video_directory(video_id)
             return None
 
-        # Calculate part lengths after TTS to ensure durations match with audio
-        part_lengths = get_part_lengths(video_id, max_paragraphs)
-        
         # Initialize the media details dictionary
         media_details = {video_id: {}}
         #print(f"initialize media_details = {media_details}")
         descriptions_gen = []
 
+        # Selection below runs in paragraph order on the prefetched results, whatever order TTS finished in
+        search_results = {}
+        for p_num in sorted(search_futures):
+            search_results.update(search_futures[p_num].result())
+
         # Iterate through each paragraph in the script
-        for paragraph_detail in video_script_dict['script_details']['paragraph_details']:
+        for paragraph_detail in paragraph_details:
             paragraph_num = int(paragraph_detail['paragraph_number'])
             paragraph_key = f"P{paragraph_num}"  # Construct the paragraph key like 'P1', 'P2', etc.
+            if paragraph_num - 1 not in part_lengths:
+                continue
 
             # Fetch image and video details for the part
-            get_part_stock_assets(video_id, paragraph_num - 1, paragraph_detail['image_descriptions'], media_details)
+            get_part_stock_assets(video_id, paragraph_num - 1, paragraph_detail['image_descriptions'], media_details, search_results)
             media_details[video_id][paragraph_key]['paragraph'] = paragraph_detail['text']
             media_details[video_id][paragraph_key]['img_tags'] = paragraph_detail['image_tags']
             descriptions_gen.append(paragraph_detail['image_descriptions']) # Collecting all descriptions
@@ -665,6 +1052,7 @@ def generate_video_assets(topic, goal):
                 download_stock_media(video_id, media_details)
 
                 print("✅ Stock assets (images and videos) generated successfully.")
+                print(f"Pexels search cache: {get_pexels_cache_stats()}")
                 return video_id
 
     else:
@@ -15,13 +15,17 @@ from tqdm import tqdm
 import soundfile as sf
 
 from dotenv import load_dotenv
-from huggingface_hub import hf_hub_download, list_repo_files
 import guidance
 from balacoon_tts import TTS
 
+from audio_lengths import get_speech_length
+from model_manifest import DEFAULT_MODEL_DIR, DEFAULT_MODEL_NAME, require_model
 from ranking_assistant import RankingAssistant
 #from script_creator import ScriptCreator
 from script_creator_no_class import gen_video_script
+from tts_chunks import ThreadLocalModel, split_into_chunks, synthesize_chunks_to_wav
+from tts_pool import iter_paragraph_audio
+from tts_server import TTSClient
 
 # Load environment variables from .env file
 load_dotenv()
@@ -33,6 +37,8 @@ used_image_urls = set()
 used_video_urls = set()
 unique_descriptions = set()
 used_descriptions = set()
+tts_model = None  # Balacoon model, loaded once per process by load_tts_model
+thread_tts_models = None  # Per-thread Balacoon models for chunked synthesis
 
 
 def update_settings(settings):
@@ -42,7 +48,10 @@ def update_settings(settings):
     global orientation, asset_size, duration_crossfade, image_per_time
     global vid_per_time, min_count_images, min_count_videos
     global video_fps, audio_fps, video_width, video_height, video_size, silence_duration
+    global current_settings, tts_workers, tts_worker_memory_gb, tts_client
+    global tts_chunk_chars, tts_chunk_workers, tts_sentence_silence, tts_model_dir, tts_model_name
 
+    current_settings = settings  # Handed to TTS worker processes
     min_stock_video_length = settings['min_stock_video_length']
     min_stock_image_length = settings['min_stock_image_length']
     max_stock_video_length = settings['max_stock_video_length']
@@ -62,6 +71,17 @@ def update_settings(settings):
     video_height = settings['video_height']
     video_size = (video_width, video_height)
     silence_duration = settings['silence_duration']
+    tts_workers = settings.get("tts_workers", 1)  # Paragraphs synthesized in parallel processes
+    tts_worker_memory_gb = settings.get("tts_worker_memory_gb")  # Memory per worker; None uses the engine default
+    tts_chunk_chars = settings.get("tts_chunk_chars", 1024)  # Longest text passed to Balacoon at once
+    tts_chunk_workers = settings.get("tts_chunk_workers", 4)  # Sentence chunks synthesized in parallel threads
+    tts_sentence_silence = settings.get("tts_sentence_silence", 0.1)  # Seconds of silence after each chunk
+    tts_model_dir = settings.get("tts_model_dir") or DEFAULT_MODEL_DIR  # Fetched with model_manifest.py
+    tts_model_name = settings.get("tts_model_name", DEFAULT_MODEL_NAME)
+
+    # Synthesize on a long-lived TTS server (see tts_server.py) instead of loading the model here
+    tts_server_url = os.getenv("TTS_SERVER_URL") or settings.get("tts_server_url")
+    tts_client = TTSClient(tts_server_url) if tts_server_url else None
     
 
 # Helper and core functions
@@ -122,46 +142,71 @@ def create_script_files(video_script_dict, video_id):
         return False
 
     
-def get_tts_audio(video_id, max_paragraphs):
+def get_tts_model_path():
+    """Returns the path of the selected Balacoon model after an offline check against the model manifest."""
+    return require_model(tts_model_dir, tts_model_name)
+
+def load_tts_model():
+    """Loads the Balacoon TTS model once per process."""
+    global tts_model
+    if tts_model is None:
+        tts_model = TTS(get_tts_model_path())
+    return tts_model
+
+def load_thread_tts_model():
+    """Balacoon model for the calling chunk synthesis thread."""
+    global thread_tts_models
+    if thread_tts_models is None:
+        model_path = get_tts_model_path()
+        thread_tts_models = ThreadLocalModel(lambda: TTS(model_path))
+    return thread_tts_models.get()
+
+def write_tts_paragraph_audio(video_id, p_num):
     """
-    Generate Text-To-Speech (TTS) audio for the paragraphs in the script.
+    Writes videos/{video_id}/p{p_num}/video/audio.wav for one paragraph and returns its path.
+    The paragraph is split into sentence chunks within the model's input limit, synthesized in
+    tts_chunk_workers threads and streamed to the file in order.
     """
-    model_repo_dir = "/home/pwalch/projects/Files/YouTubeVideoTool/text2video/tts_models"
-    model_name_str = "en_us_cmuartic_jets_cpu.addon"
     speaker_str = "rxr"
-
-    # Download the Balacoon TTS model using Hugging Face Hub
-    for name in list_repo_files(repo_id="balacoon/tts"):
-        if not os.path.isfile(os.path.join(model_repo_dir, name)):
-            hf_hub_download(
-                repo_id="balacoon/tts",
-                filename=name,
-                local_dir=model_repo_dir,
-            )
+    script_file_path = f"videos/{video_id}/p{p_num}/script/script_{p_num}.json"
     
-    model_path = os.path.join(model_repo_dir, model_name_str)
-    tts = TTS(model_path)
+    with open(script_file_path, "r") as f:
+        script_data = json.load(f)
+        text_str = script_data["paragraph"]
 
-    # Adjust for 0-based indexing: loops from 0 to max_paragraphs-1
-    for i in tqdm(range(max_paragraphs)):
-        # Adding 1 to 'i' for user-facing file naming (1-based indexing)
-        p_num = i + 1
-        script_file_path = f"videos/{video_id}/p{p_num}/script/script_{p_num}.json"
-        
-        with open(script_file_path, "r") as f:
-            script_data = json.load(f)
-            text_str = script_data["paragraph"]
+    chunks = split_into_chunks(text_str, tts_chunk_chars) or [text_str]
+
+    # Generate TTS audio samples chunk by chunk
+    if tts_client is not None:
+        synthesize = lambda chunk: tts_client.synthesize_balacoon(chunk, speaker_str)
+    else:
+        def synthesize(chunk):
+            tts = load_thread_tts_model()
+            return tts.synthesize(chunk, speaker_str), tts.get_sampling_rate()
 
-        # Truncate or process the text if necessary
-        if len(text_str) > 1024:
-            text_str = text_str[:1024]
+    # Save audio to .wav file (change to .mp3 as needed)
+    output_file_path = f"videos/{video_id}/p{p_num}/video/audio.wav"
+    synthesize_chunks_to_wav(synthesize, chunks, output_file_path, silence_seconds=tts_sentence_silence,
+                             workers=tts_chunk_workers, tail_seconds=silence_duration)
+    return output_file_path
 
-        # Generate TTS audio samples from text
-        samples = tts.synthesize(text_str, speaker_str)
+def get_tts_audio(video_id, max_paragraphs, on_paragraph_done=None):
+    """
+    Generate Text-To-Speech (TTS) audio for the paragraphs in the script.
+    With tts_workers > 1 the paragraphs are synthesized in parallel worker processes.
+
+    on_paragraph_done (callable): Called with (p_num, audio_path) as soon as a paragraph's audio is written.
+    """
+    if tts_workers > 1:
+        paragraphs = iter_paragraph_audio("balacoon", current_settings, video_id, max_paragraphs,
+                                          tts_workers, tts_worker_memory_gb)
+    else:
+        # Adding 1 to 'i' for user-facing file naming (1-based indexing)
+        paragraphs = ((i + 1, write_tts_paragraph_audio(video_id, i + 1)) for i in tqdm(range(max_paragraphs)))
 
-        # Save audio to .wav file (change to .mp3 as needed)
-        output_file_path = f"videos/{video_id}/p{p_num}/video/audio.wav"
-        sf.write(output_file_path, samples, tts.get_sampling_rate())
+    for p_num, audio_path in paragraphs:
+        if on_paragraph_done:
+            on_paragraph_done(p_num, audio_path)
         
     return True
 
@@ -237,11 +282,9 @@ def get_part_lengths(video_id, max_paragraphs):
             print(f"Audio file does not exist for paragraph {p_num}. Skipping.")
             continue
 
-        with sf.SoundFile(audio_path) as f:
-            frames = f.frames
-            rate = f.samplerate
-            audio_length = frames / float(rate)  # Audio length in seconds
-            total_length = audio_length + silence_duration / 1000.0  # Convert ms to s for total length
+        # The closing silence is already part of the file, plan with the spoken length as before
+        audio_length = get_speech_length(audio_path, silence_duration)  # Audio length in seconds
+        total_length = audio_length + silence_duration / 1000.0  # Convert ms to s for total length
 
         # Using the optimize_clip_distribution function
         N_i, d_i, N_v, d_v = optimize_clip_distribution(total_length)
@@ -1,9 +1,18 @@
+from moviepy.config import get_setting
 from moviepy.editor import *
+from PIL import Image
+import math
+import multiprocessing
+import numpy as np
 import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 from pydub import AudioSegment
 
 # Assuming necessary functions from video_creator are correctly imported
 from video_creator import get_part_lengths  # or other necessary imports from video_creator
+from render_manifest import RenderManifest, paragraph_input_hash
+from timeline import Timeline
 
 def update_settings(new_settings):
     global settings
@@ -29,17 +38,101 @@ def update_settings(new_settings):
     silence_duration = settings.get('silence_duration', 2000)
     YT_shorts_setting = settings.get('YT_shorts_setting', False)
 
+still_frames = {}  # (image path, mtime, output size) -> decoded uint8 frame, cleared after every render
+
+def load_still_frame(image_path):
+    """Decodes an image once into a uint8 RGB frame at the output size (images are prepared at that size; previews scale them here)."""
+    key = (image_path, os.path.getmtime(image_path), video_size)
+    if key not in still_frames:
+        with Image.open(image_path) as image:
+            image = image.convert("RGB")
+            if image.size != video_size:
+                image = image.resize(video_size, Image.Resampling.LANCZOS)
+            still_frames[key] = np.asarray(image, dtype=np.uint8)
+    return still_frames[key]
+
 def get_image_clip(image_path, duration):
-    return ImageClip(image_path).set_duration(duration)
+    # The timeline hands this frame buffer through unchanged for every frame the image is on screen
+    return ImageClip(load_still_frame(image_path)).set_duration(duration)
+
+def get_preview_settings(base_settings):
+    """
+    Settings for a quick preview render: a fraction of the resolution (preview_scale) and fps
+    (preview_fps), a fast encoder preset, and its own output file and render cache.
+    """
+    scale = base_settings.get("preview_scale", 1 / 3)
+    return {
+        **base_settings,
+        # libx264 needs even dimensions
+        "video_width": max(2, int(base_settings.get("video_width", 1920) * scale) // 2 * 2),
+        "video_height": max(2, int(base_settings.get("video_height", 1080) * scale) // 2 * 2),
+        "video_fps": base_settings.get("preview_fps", 12),
+        "audio_fps": 22050,
+        "render_preset": "ultrafast",
+        "render_name": "preview",
+    }
+
+def get_output_paths(video_id):
+    """Final video path and paragraph render dir of the current render (final or preview)."""
+    render_name = settings.get("render_name", "final")
+    final_video_path = os.path.join("videos", video_id, f"{render_name}_video.mp4")
+    render_dir = os.path.join("videos", video_id, "render" if render_name == "final" else f"render_{render_name}")
+    return final_video_path, render_dir
 
 def get_video_clip(video_path, duration):
     clip = VideoFileClip(video_path)
-    return clip.subclip(0, min(duration, clip.duration))
+    clip = clip.subclip(0, min(duration, clip.duration))
+    if tuple(clip.size) != video_size:
+        # Stock renditions are picked by size, not exact resolution: scale to fill, then center crop.
+        # Frames are scaled with Pillow directly: moviepy's resize needs cv2 or Image.ANTIALIAS (gone in Pillow 10)
+        scale = max(video_size[0] / clip.w, video_size[1] / clip.h)
+        scaled_size = (max(video_size[0], round(clip.w * scale)), max(video_size[1], round(clip.h * scale)))
+        left, top = (scaled_size[0] - video_size[0]) // 2, (scaled_size[1] - video_size[1]) // 2
+        crop_box = (left, top, left + video_size[0], top + video_size[1])
+
+        def fit_frame(frame):
+            image = Image.fromarray(frame).resize(scaled_size, Image.Resampling.LANCZOS)
+            return np.asarray(image.crop(crop_box))
+
+        clip = clip.fl_image(fit_frame)
+    return clip
+
+def get_paragraph_assets(video_id, i, part_data):
+    """Image and video files planned for paragraph i (0-based), whether they exist or not."""
+    p_num = i + 1  # Paragraph number
+    paragraph_path = os.path.join("videos", video_id, f"p{p_num}")  # Path to the paragraph directory
+
+    img_assets = [os.path.join(paragraph_path, "img", f"image{j+1}.jpg") for j in range(part_data["num_images"])]
+    video_assets = [os.path.join(paragraph_path, "video", f"video{j+1}.mp4") for j in range(part_data["num_videos"])]
+    return img_assets, video_assets
 
-def crossfade_transition(clip1, clip2):
-    duration = settings.get("duration_crossfade", 1)
-    return CompositeVideoClip([clip1, clip2.set_start(clip1.duration - duration).crossfadein(duration)],
-                              size=(settings.get("video_width", 1920), settings.get("video_height", 1080)))
+def create_paragraph_segment(video_id, i, part_data):
+    """Builds the video clip of paragraph i (0-based) from its planned images and videos, or None without clips."""
+    img_assets, video_assets = get_paragraph_assets(video_id, i, part_data)
+
+    paragraph_clips = []  # List to store all clips (images and videos) for this paragraph
+
+    # Process image assets
+    for j, image_path in enumerate(img_assets):
+        if os.path.exists(image_path):  # Check if the image file exists
+            img_duration = part_data['img_durations'][j]  # Duration for this image
+            segment = get_image_clip(image_path, img_duration)  # Create an image clip
+            paragraph_clips.append(segment)  # Append the image clip to the paragraph's clips list
+
+    # Process video assets
+    for j, video_path in enumerate(video_assets):
+        if os.path.exists(video_path):  # Check if the video file exists
+            vid_duration = part_data['vid_durations'][j]  # Duration for this video
+            segment = get_video_clip(video_path, vid_duration)  # Create a video clip
+            paragraph_clips.append(segment)  # Append the video clip to the paragraph's clips list
+
+    if not paragraph_clips:  # If there are no clips for this paragraph
+        return None
+
+    # Lay the clips out on one flat timeline with crossfades between neighbours
+    timeline = Timeline(paragraph_clips, settings.get("duration_crossfade", 1),
+                        (settings.get("video_width", 1920), settings.get("video_height", 1080)))
+    return timeline.to_clip()
 
 def create_video_segments(video_id):
     all_clips = []
@@ -47,48 +140,124 @@ def create_video_segments(video_id):
     part_lengths = get_part_lengths(video_id, settings["max_paragraphs"])
     print(f"part_lenths = {part_lengths}")
     for i in range(settings["max_paragraphs"]):
-        p_num = i + 1  # Paragraph number
-        paragraph_path = os.path.join("videos", video_id, f"p{p_num}")  # Path to the paragraph directory
-        
         part_data = part_lengths.get(i)  # Retrieve data for this part
         if not part_data:  # If no data, skip this part
             continue
 
-        img_assets = [os.path.join(paragraph_path, "img", f"image{j+1}.jpg") for j in range(part_data["num_images"])]
-        video_assets = [os.path.join(paragraph_path, "video", f"video{j+1}.mp4") for j in range(part_data["num_videos"])]
-
-        paragraph_clips = []  # List to store all clips (images and videos) for this paragraph
-
-        # Process image assets
-        for j, image_path in enumerate(img_assets):
-            if os.path.exists(image_path):  # Check if the image file exists
-                img_duration = part_data['img_durations'][j]  # Duration for this image
-                segment = get_image_clip(image_path, img_duration)  # Create an image clip
-                paragraph_clips.append(segment)  # Append the image clip to the paragraph's clips list
-
-        # Process video assets
-        for j, video_path in enumerate(video_assets):
-            if os.path.exists(video_path):  # Check if the video file exists
-                vid_duration = part_data['vid_durations'][j]  # Duration for this video
-                segment = get_video_clip(video_path, vid_duration)  # Create a video clip
-                paragraph_clips.append(segment)  # Append the video clip to the paragraph's clips list
-
-        if paragraph_clips:  # If there are clips for this paragraph
-            # Create a composite video clip starting with the first clip
-            paragraph_video = CompositeVideoClip([paragraph_clips[0]])
-            # Add the rest of the clips with crossfade transition
-            for next_clip in paragraph_clips[1:]:
-                paragraph_video = crossfade_transition(paragraph_video, next_clip)
+        paragraph_video = create_paragraph_segment(video_id, i, part_data)
+        if paragraph_video is not None:
             all_clips.append(paragraph_video)  # Append the paragraph video to the all clips list
 
     return all_clips  # Return the list of all video clips (one per paragraph)
 
+def render_paragraph(video_id, i, part_data, audio_path, output_path, new_settings, threads=1):
+    """
+    Renders paragraph i with its own narration to output_path (runs in a worker process).
+    The last frame is held if the narration outlasts the planned clips, so no audio is cut; a paragraph
+    without any clip (all downloads failed) is rendered black for the length of its narration.
+    """
+    update_settings(new_settings)
+    paragraph_video = create_paragraph_segment(video_id, i, part_data)
+    audio = AudioFileClip(audio_path)
+    if paragraph_video is None:
+        print(f"No clips for paragraph {i + 1}, rendering its narration over black")
+        paragraph_video = ColorClip(size=video_size, color=(0, 0, 0), duration=audio.duration)
+    # A whole number of frames, so every paragraph starts on a frame boundary of the joined video
+    fps = settings.get("video_fps", 30)
+    duration = math.ceil(max(paragraph_video.duration, audio.duration) * fps - 1e-6) / fps
+    # Pad the narration with silence to the same length, so both streams end together and the concat
+    # demuxer starts the next paragraph exactly after the last video frame
+    audio = CompositeAudioClip([audio]).set_duration(duration)
+    paragraph_video = paragraph_video.set_duration(duration).set_audio(audio)
+    # Same video codec and fps for every paragraph, so the video can be joined without re-encoding.
+    # Audio stays PCM: it has no encoder priming or padding, so the joins are gapless and AAC is encoded once at the concat
+    paragraph_video.write_videofile(output_path, fps=fps, codec="libx264",
+                                    audio_codec="pcm_s16le", audio_fps=settings.get("audio_fps", 44100),
+                                    preset=settings.get("render_preset", "medium"), threads=threads, logger=None)
+    return output_path
+
+def concat_paragraph_files(video_id, paragraph_paths, final_video_path):
+    """
+    Joins the paragraph files with the ffmpeg concat demuxer: the video is stream copied, the PCM
+    narration is encoded to AAC once. aresample fills the sub-frame audio gaps left where a paragraph's
+    narration ends before its last video frame, so audio timestamps stay on the video's.
+    """
+    list_path = os.path.join(get_output_paths(video_id)[1], "concat.txt")
+    with open(list_path, "w") as f:
+        for path in paragraph_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    command = [
+        get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-c:v", "copy", "-af", "aresample=async=1", "-c:a", "aac", "-b:a", "192k",
+        "-movflags", "+faststart", final_video_path,
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+    return final_video_path
+
+def get_render_settings():
+    """Settings that change a paragraph render, part of its manifest hash."""
+    return {key: settings.get(key) for key in ("video_width", "video_height", "video_fps", "audio_fps", "duration_crossfade", "render_preset")}
+
+def render_video_paragraphs(video_id, audio_paths, workers, incremental=False):
+    """
+    Renders every paragraph to videos/{id}/render/pN.mkv (render_preview/ for previews; in a process pool with workers > 1),
+    then joins them without re-encoding the video. Paragraphs are cut back to back, as in render_video, so there is
+    no crossfade to rebuild at the joins.
+
+    With incremental, paragraphs whose inputs (audio, assets, durations, render settings) hash the
+    same as in the render manifest keep their previous render and are only joined again.
+    """
+    part_lengths = get_part_lengths(video_id, settings["max_paragraphs"])
+    final_video_path, render_dir = get_output_paths(video_id)
+    os.makedirs(render_dir, exist_ok=True)
+    manifest = RenderManifest(render_dir)
+    render_settings = get_render_settings()
+
+    jobs = {}  # p_num -> (render arguments, input hash)
+    paragraph_paths = {}
+    for i in range(len(audio_paths)):
+        # Every paragraph with narration is rendered, black if no clips were planned for it
+        part_data = part_lengths.get(i) or {"num_images": 0, "num_videos": 0}
+        p_num = i + 1
+        output_path = os.path.join(render_dir, f"p{p_num}.mkv")
+        img_assets, video_assets = get_paragraph_assets(video_id, i, part_data)
+        input_hash = paragraph_input_hash(audio_paths[i], img_assets + video_assets, part_data, render_settings,
+                                          digest=manifest.file_digest)
+        if incremental and manifest.is_current(p_num, input_hash):
+            paragraph_paths[p_num] = manifest.file(p_num)
+            continue
+        jobs[p_num] = ((video_id, i, part_data, audio_paths[i], output_path), input_hash)
+    print(f"Rendering {len(jobs)} paragraphs, reusing {len(paragraph_paths)} unchanged renders")
+
+    threads = max(1, (os.cpu_count() or 1) // min(workers, max(len(jobs), 1)))  # Split the cores between the paragraph encoders
+    if workers > 1 and len(jobs) > 1:
+        # Spawned workers start clean instead of inheriting moviepy readers from this process
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {p_num: executor.submit(render_paragraph, *args, settings, threads) for p_num, (args, _) in jobs.items()}
+            results = {p_num: future.result() for p_num, future in futures.items()}
+    else:
+        results = {p_num: render_paragraph(*args, settings, threads) for p_num, (args, _) in jobs.items()}
+
+    for p_num, path in results.items():
+        manifest.set(p_num, jobs[p_num][1], path)
+        paragraph_paths[p_num] = path
+    manifest.save()
+
+    if not paragraph_paths:
+        print("No paragraphs were rendered. Check the input data and paths.")  # Debug print
+        return None
+    return concat_paragraph_files(video_id, [paragraph_paths[p_num] for p_num in sorted(paragraph_paths)], final_video_path)
+
 def render_video(video_id, video_segments, audios):
     print(f"Video segments: {video_segments}")  # Debug print
     print(f"Audio segments: {audios}")  # Debug print
     video_fps = settings.get("video_fps", 30)
     try:
-        video = concatenate_videoclips(video_segments, method="compose")
+        # Every paragraph is a flat Timeline at the output size, cut back to back: chain them instead of
+        # compositing each frame onto a background clip
+        video = concatenate_videoclips(video_segments, method="chain")
         audio = concatenate_audioclips(audios)
         print(f"Video duration: {video.duration}, Audio duration: {audio.duration}")  # Debug print
 
@@ -106,24 +275,31 @@ def render_video(video_id, video_segments, audios):
 
         video = video.set_audio(audio)
 
-        final_video_path = os.path.join("videos", video_id, "final_video.mp4")
-        video.write_videofile(final_video_path, fps=video_fps)
+        final_video_path = get_output_paths(video_id)[0]
+        video.write_videofile(final_video_path, fps=video_fps, audio_fps=settings.get("audio_fps", 44100),
+                              preset=settings.get("render_preset", "medium"))
         return final_video_path
     except Exception as e:
         print(f"Error occurred while rendering video: {e}")  # Debug print
 
 
 def audio_gen(audio_paths):
-    audios = []
-    for audio_path in audio_paths:
-        audio_clip = AudioSegment.from_file(audio_path, format="wav")
-        silence = AudioSegment.silent(duration=settings.get("silence_duration", 2000))
-        combined_audio = audio_clip + silence
-        combined_audio.export(audio_path, format="wav")
-        audios.append(AudioFileClip(audio_path))
-    return audios
-
-def video_gen(video_id):
+    # The paragraph-end silence is written into audio.wav by the TTS step, so the files are used as they are
+    return [AudioFileClip(audio_path) for audio_path in audio_paths]
+
+def video_gen(video_id, preview=False):
+    """
+    Renders videos/{video_id}/final_video.mp4, or with preview a low resolution, low fps
+    videos/{video_id}/preview_video.mp4 from the same timeline for checking the pacing.
+    """
+    if preview:
+        final_settings = settings
+        update_settings(get_preview_settings(final_settings))
+        try:
+            return video_gen(video_id)
+        finally:
+            update_settings(final_settings)
+
     # Ensure settings are loaded or set before this function
     print(f"Generating video for Video ID: {video_id}")  # Debug print
     audio_paths = []
@@ -136,12 +312,26 @@ def video_gen(video_id):
             return None
         audio_paths.append(audio_path)
 
-    audios = audio_gen(audio_paths)
-    video_segments = create_video_segments(video_id)
-    if not video_segments:  # Check if video segments are empty
-        print("No video segments were created. Check the input data and paths.")  # Debug print
-    final_video_path = render_video(video_id, video_segments, audios)
-    return final_video_path
+    try:
+        render_workers = settings.get("render_workers", 1)
+        incremental_render = settings.get("incremental_render", False)
+        if render_workers > 1 or incremental_render:
+            # Paragraphs render separately (in parallel processes, reusing unchanged ones) and are joined with ffmpeg (video stream copy, one AAC encode)
+            try:
+                return render_video_paragraphs(video_id, audio_paths, render_workers, incremental_render)
+            except Exception as e:
+                print(f"Error occurred while rendering paragraphs: {e}")  # Debug print
+                return None
+
+        audios = audio_gen(audio_paths)
+        video_segments = create_video_segments(video_id)
+        if not video_segments:  # Check if video segments are empty
+            print("No video segments were created. Check the input data and paths.")  # Debug print
+        final_video_path = render_video(video_id, video_segments, audios)
+        return final_video_path
+    finally:
+        # Decoded stills are only reused within one render; free them so a long-lived app does not keep every frame
+        still_frames.clear()
 
 if __name__ == "__main__":
     video_id = input("Enter the video id: ")
@@ -0,0 +1,72 @@
+'''
+    voice_registry.py
+
+    - In-process registry of Bark voice prompts (history_prompt)
+    - Known voices are the presets listed in SpeakerSettings.csv and the .npz files of the custom
+      voice directories (e.g. AI_Voice_Lab/Voice_Output/Patrick.npz, registered as "Patrick")
+    - Every prompt is loaded from disk once per process and then handed to Bark as an in-memory dict
+'''
+
+import csv
+import os
+import threading
+
+import numpy as np
+
+_prompts = {}  # preset name or .npz path -> loaded prompt arrays
+_lock = threading.Lock()
+
+
+def load_voice_prompt(name_or_path):
+    """
+    Loads a Bark voice prompt once and keeps its arrays resident.
+
+    Parameters:
+    name_or_path (str): Bark preset name (e.g. 'v2/en_speaker_6') or path of a .npz prompt.
+
+    Returns:
+    dict: semantic_prompt, coarse_prompt and fine_prompt arrays, usable as Bark's history_prompt.
+    """
+    with _lock:
+        prompt = _prompts.get(name_or_path)
+        if prompt is None:
+            from bark.generation import _load_history_prompt
+            prompt = {key: np.asarray(value) for key, value in _load_history_prompt(name_or_path).items()}
+            _prompts[name_or_path] = prompt
+        return prompt
+
+
+class VoiceRegistry:
+    def __init__(self, speakers_csv="SpeakerSettings.csv", voice_dirs=("AI_Voice_Lab/Voice_Output",)):
+        """
+        Parameters:
+        speakers_csv (str): CSV with a 'Prompt Name' (and 'Speaker') column of Bark presets.
+        voice_dirs (list): Directories with custom .npz voice prompts.
+        """
+        self.voices = {}  # name -> preset name or .npz path
+        if speakers_csv and os.path.exists(speakers_csv):
+            with open(speakers_csv, newline="") as f:
+                for row in csv.DictReader(f):
+                    self.voices[row["Prompt Name"]] = row["Prompt Name"]
+                    self.voices.setdefault(row["Speaker"], row["Prompt Name"])
+        for voice_dir in voice_dirs or ():
+            if not os.path.isdir(voice_dir):
+                continue
+            for file_name in sorted(os.listdir(voice_dir)):
+                if file_name.endswith(".npz"):
+                    self.voices[os.path.splitext(file_name)[0]] = os.path.join(voice_dir, file_name)
+
+    def names(self):
+        return sorted(self.voices)
+
+    def resolve(self, name):
+        """Preset name or .npz path for a registered voice; unknown names (presets, paths) are passed through."""
+        return self.voices.get(name, name)
+
+    def get(self, name):
+        return load_voice_prompt(self.resolve(name))
+
+    def preload(self, names=None):
+        """Loads the given voices (default: all registered) so the first synthesis does not wait on disk."""
+        for name in names or self.names():
+            self.get(name)